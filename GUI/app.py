@@ -1,21 +1,33 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session, Request
+from flask import Flask, render_template, request, redirect, url_for, flash, Request, Response, jsonify, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
-from models import db, User, Question, WrongAnswer, WrongAnswerSet, QuestionSet
-import pandas as pd
-import random
+from models import db, User, Question, WrongAnswer, WrongAnswerSet, QuestionSet, ImportJob, QuizAttempt
+from db_config import configure_database
+from migrations import upgrade_database
+from import_jobs import submit_import, job_progress, fail_stale_jobs
+from pagination import Page, paginate_rows
+from listings import question_sets_with_counts, quiz_history_rows, latest_wrong_answers, question_stats_summary, most_missed_questions, MASTERED_STREAK
+from query_audit import install_request_query_log
+from sampling import IdIndex, get_id_index, invalidate_id_index, sample_question_ids
+from exporter import EXPORT_COLUMNS, EXPORT_MIMETYPES, SELECTED_ANSWER_COLUMN, export_chunks, question_set_rows, wrong_answer_rows
+from search import MAX_COUNTED_RESULTS, search_questions
+from quiz_store import QuestionSnapshot, create_attempt, get_current_attempt, attempt_question_ids, get_attempt_question, record_answer, finish_attempt, flush_user_attempts, sweep_idle_attempts, invalidate_attempt_cache
+from sqlalchemy import Row, Select, select
 from sqlalchemy.orm import joinedload
-from typing import List, Optional, cast, Dict, Tuple
+from typing import List, Optional, cast
+from urllib.parse import quote
 import os
 
 basedir: str = os.path.abspath(os.path.dirname(__file__))
 
 app: Flask = Flask(__name__)
 app.config['SECRET_KEY'] = 'your_secret_key'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(basedir, 'database.db')
+# DATABASE_URL selects the database (SQLite file by default), see db_config.py
+configure_database(app, basedir)
 
-db.init_app(app)
+with app.app_context():
+    install_request_query_log(app, db.engine)
 
 login_manager: LoginManager = LoginManager()
 login_manager.init_app(app)
@@ -27,9 +39,12 @@ def load_user(user_id: str) -> Optional[User]:
 
 @app.route('/')
 def index() -> str:
-    question_sets: List[QuestionSet] = []
+    # (QuestionSet, question_count) rows
+    question_sets: List[Row] = []
     if current_user.is_authenticated:
-        question_sets = QuestionSet.query.filter_by(user_id=current_user.id).order_by(QuestionSet.name).all()
+        question_sets = list(db.session.execute(
+            question_sets_with_counts(current_user.id).order_by(None).order_by(QuestionSet.name)
+        ).all())
     return render_template('index.html', question_sets=question_sets)
 
 @app.route('/register', methods=['GET', 'POST'])
@@ -60,6 +75,9 @@ def login() -> str:
         
         if user and check_password_hash(user.password, password):
             login_user(user)
+            # Answers a quiz left buffered in an earlier session go to the history now
+            flush_user_attempts(user.id)
+            db.session.commit()
             return redirect(url_for('index'))
         else:
             flash('登录失败。请检查用户名和密码。')
@@ -68,6 +86,8 @@ def login() -> str:
 @app.route('/logout')
 @login_required
 def logout() -> str:
+    flush_user_attempts(current_user.id)
+    db.session.commit()
     logout_user()
     return redirect(url_for('index'))
 
@@ -85,72 +105,9 @@ def import_excel() -> str:
             return redirect(request.url)
         
         if file.filename.endswith('.xlsx'):
-            try:
-                file_name: str = file.filename
-                new_question_set = QuestionSet(name=file_name, user_id=current_user.id)
-                db.session.add(new_question_set)
-                db.session.commit() 
-
-                df: pd.DataFrame = pd.read_excel(file)
-                required_cols: List[str] = ['题目', 'A', 'B', 'C', 'D', '正确答案', '是否多选']
-                if not all(col in df.columns for col in required_cols):
-                    flash(f'Excel 文件必须包含以下列: {", ".join(required_cols)}')
-                    db.session.rollback() 
-                    return redirect(url_for('import_excel'))
-                
-                new_questions: List[Question] = []
-                for _, row in df.iterrows():
-                    is_multi_val: bool = row.get('是否多选', False)
-                    if pd.isna(is_multi_val):
-                        is_multi_val = False
-
-                    question = Question(
-                        question_text=str(row['题目']),
-                        option_a=str(row['A']),
-                        option_b=str(row['B']),
-                        option_c=str(row['C']),
-                        option_d=str(row['D']),
-                        correct_answer=str(row['正确答案']).strip(),
-                        is_multiple_choice=bool(is_multi_val),
-                        user_id=current_user.id,
-                        question_set_id=new_question_set.id 
-                    )
-                    new_questions.append(question)
-                
-                if not new_questions:
-                    flash('Excel 文件为空或无法读取题目。')
-                    db.session.rollback()
-                    return redirect(url_for('import_excel'))
-
-                db.session.add_all(new_questions)
-                db.session.commit()
-                
-                flash(f'成功导入 {len(new_questions)} 道题目到 "{file_name}" 题集!')
-
-                if new_questions:
-                    flash('已开始使用新题目进行测验...')
-                    
-                    new_wrong_answer_set = WrongAnswerSet(user_id=current_user.id, question_set_id=new_question_set.id)
-                    db.session.add(new_wrong_answer_set)
-                    db.session.commit()
-                    session['wrong_answer_set_id'] = new_wrong_answer_set.id
-                    
-                    new_question_ids: List[int] = [q.id for q in new_questions]
-                    random.shuffle(new_question_ids)
-                    
-                    session['question_ids'] = new_question_ids
-                    session['current_question_index'] = 0
-                    
-                    first_question_id: int = session['question_ids'][0]
-                    return redirect(url_for('quiz', question_id=first_question_id))
-                else:
-                    return redirect(url_for('index'))
-
-            except Exception as e:
-                db.session.rollback()
-                flash(f'发生错误: {e}')
-            
-            return redirect(url_for('import_excel'))
+            # Parsing and inserting happen on the import worker pool, the page polls for progress.
+            job: ImportJob = submit_import(app, file, current_user.id)
+            return redirect(url_for('import_job', job_id=job.id))
         
         else:
             flash('请上传一个有效的 .xlsx 文件')
@@ -158,6 +115,21 @@ def import_excel() -> str:
             
     return render_template('import_excel.html')
 
+@app.route('/import_jobs/<int:job_id>')
+@login_required
+def import_job(job_id: int) -> str:
+    fail_stale_jobs([job_id])
+    job: ImportJob = ImportJob.query.filter_by(id=job_id, user_id=current_user.id).first_or_404()
+    return render_template('import_job.html', job=job)
+
+@app.route('/import_jobs/<int:job_id>/progress')
+@login_required
+def import_job_progress(job_id: int) -> Response:
+    # A job whose worker died (restart) is failed here, so the page stops polling
+    fail_stale_jobs([job_id])
+    job: ImportJob = ImportJob.query.filter_by(id=job_id, user_id=current_user.id).first_or_404()
+    return jsonify(job_progress(job))
+
 @app.route('/start_quiz', methods=['POST'])
 @login_required
 def start_quiz() -> str:
@@ -170,43 +142,47 @@ def start_quiz() -> str:
 
     num_questions: int = int(num_questions_str)
     
-    query = Question.query.filter_by(user_id=current_user.id)
     selected_set_id: Optional[int] = None
-    
     if question_set_id_str and question_set_id_str.isdigit():
-        query = query.filter_by(question_set_id=int(question_set_id_str))
         selected_set_id = int(question_set_id_str)
+
+    # Optional share of multiple-choice questions, in percent
+    multi_ratio_str: Optional[str] = request.form.get('multi_ratio')
+    multi_ratio: Optional[float] = None
+    if multi_ratio_str and multi_ratio_str.isdigit():
+        multi_ratio = min(int(multi_ratio_str), 100) / 100
     
-    all_questions: List[Question] = query.all()
+    # Sampling only touches question ids, see sampling.py
+    id_index: IdIndex = get_id_index(current_user.id, selected_set_id)
+    total_available: int = len(id_index.ids)
     
-    if len(all_questions) == 0:
+    if total_available == 0:
         flash('你所选的题集中没有题目。请先导入。')
         return redirect(url_for('index'))
     
-    if len(all_questions) < num_questions:
-        flash(f'该题集总共只有 {len(all_questions)} 道题。将开始一个 {len(all_questions)} 道题的测验。')
-        num_questions = len(all_questions)
+    if total_available < num_questions:
+        flash(f'该题集总共只有 {total_available} 道题。将开始一个 {total_available} 道题的测验。')
+        num_questions = total_available
         
-    new_wrong_answer_set = WrongAnswerSet(user_id=current_user.id, question_set_id=selected_set_id)
-    db.session.add(new_wrong_answer_set)
-    db.session.commit()
-    session['wrong_answer_set_id'] = new_wrong_answer_set.id
-        
-    sampled_questions: List[Question] = random.sample(all_questions, num_questions)
-    session['question_ids'] = [q.id for q in sampled_questions]
-    session['current_question_index'] = 0
+    question_ids: List[int] = sample_question_ids(id_index, num_questions, multi_ratio)
+    # Only the attempt id goes into the cookie, the question list lives server-side.
+    create_attempt(current_user.id, question_ids, selected_set_id)
+    # Close quizzes abandoned by anyone, at most every few minutes
+    sweep_idle_attempts()
     
-    first_question_id: int = session['question_ids'][0]
-    return redirect(url_for('quiz', question_id=first_question_id))
+    return redirect(url_for('quiz', question_id=question_ids[0]))
 
 @app.route('/quiz/<int:question_id>', methods=['GET', 'POST'])
 @login_required
 def quiz(question_id: int) -> str:
-    if 'question_ids' not in session or not session['question_ids']:
+    attempt: Optional[QuizAttempt] = get_current_attempt(current_user.id)
+    if not attempt:
         flash('没有正在进行的测验。请开始一个新的测验。')
         return redirect(url_for('index'))
+    question_ids: List[int] = attempt_question_ids(attempt)
 
-    question: Optional[Question] = db.session.get(Question, question_id)
+    # Rendering and grading are both served from the attempt's prefetched question batch.
+    question: Optional[QuestionSnapshot] = get_attempt_question(attempt, question_id)
     if not question:
         flash('未找到题目。')
         return redirect(url_for('index'))
@@ -230,49 +206,22 @@ def quiz(question_id: int) -> str:
                 user_answer_to_store = ""
                 is_correct = False
 
-        if not is_correct:
-            current_wrong_answer_set_id: Optional[int] = session.get('wrong_answer_set_id')
-            if not current_wrong_answer_set_id:
-                new_set = WrongAnswerSet(user_id=current_user.id) 
-                db.session.add(new_set)
-                db.session.commit()
-                current_wrong_answer_set_id = new_set.id
-                session['wrong_answer_set_id'] = current_wrong_answer_set_id
-
-            wrong_answer = WrongAnswer(
-                question_id=question.id,
-                selected_answer=user_answer_to_store,
-                user_id=current_user.id,
-                wrong_answer_set_id=current_wrong_answer_set_id
-            )
-            db.session.add(wrong_answer)
-            db.session.commit()
-
-        session['current_question_index'] += 1
-        current_index: int = session['current_question_index']
+        # Answers are buffered in the attempt and written in batches, see quiz_store.record_answer.
+        current_index: int = record_answer(attempt, question.id, user_answer_to_store, is_correct)
         
-        if current_index < len(session['question_ids']):
-            next_question_id: int = session['question_ids'][current_index]
+        if current_index < len(question_ids):
+            db.session.commit()
+            next_question_id: int = question_ids[current_index]
             return redirect(url_for('quiz', question_id=next_question_id))
         else:
-            session.pop('question_ids', None)
-            session.pop('current_question_index', None)
-            wrong_set_id: Optional[int] = session.pop('wrong_answer_set_id', None)
-            
-            if wrong_set_id:
-                count: int = WrongAnswer.query.filter_by(wrong_answer_set_id=wrong_set_id).count()
-                if count > 0:
-                    flash('测验完成！快去看看你的错题吧。')
-                    return redirect(url_for('quiz_history'))
-                else:
-                    empty_set: Optional[WrongAnswerSet] = db.session.get(WrongAnswerSet, wrong_set_id)
-                    if empty_set:
-                        db.session.delete(empty_set)
-                        db.session.commit()
-                    flash('测验完成！你太棒了，全部正确！')
-                    return redirect(url_for('index'))
+            wrong_count: int = attempt.wrong_count
+            finish_attempt(attempt)
+            db.session.commit()
             
-            flash('测验完成！')
+            if wrong_count > 0:
+                flash('测验完成！快去看看你的错题吧。')
+                return redirect(url_for('quiz_history'))
+            flash('测验完成！你太棒了，全部正确！')
             return redirect(url_for('index'))
     
     options: List[dict] = [
@@ -282,8 +231,8 @@ def quiz(question_id: int) -> str:
         {'value': 'D', 'text': question.option_d}
     ]
     
-    total_questions: int = len(session.get('question_ids', []))
-    current_question_number: int = session.get('current_question_index', 0) + 1
+    total_questions: int = len(question_ids)
+    current_question_number: int = attempt.current_index + 1
     
     return render_template('quiz.html', 
                            question=question, 
@@ -296,62 +245,66 @@ def quiz(question_id: int) -> str:
 @login_required
 def wrong_answer_sets() -> str:
     question_sets: List[QuestionSet] = QuestionSet.query.filter_by(user_id=current_user.id).order_by(QuestionSet.timestamp.desc()).all()
-    print(question_sets)
     return render_template('wrong_answer_sets.html', question_sets=question_sets)
 
 
 # --- MODIFIED: Goal 1 ---
-# This route now fetches the most recent WrongAnswer for each unique Question
+# This route shows the most recent WrongAnswer for each unique Question, one page at a time
 @app.route('/wrong_answer/<set_id>')
 @login_required
 def wrong_answer(set_id: str) -> str:
     title: str = ""
-    
-    # Query for (Question, WrongAnswer) tuples, ordered by time.
-    # This allows us to find the *most recent* wrong answer for each question.
-    query = db.session.query(Question, WrongAnswer).join(WrongAnswer).filter(
-        WrongAnswer.user_id == current_user.id
-    ).order_by(WrongAnswer.timestamp.asc()) # Get oldest first
+    page: int = request.args.get('page', 1, type=int)
     
     if set_id == 'all':
         title = "所有错题"
+        ranked_subquery = latest_wrong_answers(current_user.id)
     else:
         try:
             set_id_int: int = int(set_id)
             # Filter by the specific question set
-            query = query.filter(Question.question_set_id == set_id_int)
+            ranked_subquery = latest_wrong_answers(current_user.id, set_id_int)
             set_data: Optional[QuestionSet] = db.session.get(QuestionSet, set_id_int)
-            title = f'"{set_data.name}" 错题集' if set_data else "错题集"
+            title = f'"{set_data.name}" 错题集' if set_data and set_data.user_id == current_user.id else "错题集"
         except ValueError:
             flash("无效的题集ID。")
             return redirect(url_for('wrong_answer_sets'))
-
-    # Process results to get the *most recent* wrong answer for each unique question
-    all_wrong_answers: List[Tuple[Question, WrongAnswer]] = query.all()
     
-    # We use a dict to store the latest entry for each question ID.
-    # As we iterate, newer entries (later in the list) overwrite older ones.
-    unique_wrong_answers_map: Dict[int, Tuple[Question, WrongAnswer]] = {}
-    for question, wrong_answer in all_wrong_answers:
-        unique_wrong_answers_map[question.id] = (question, wrong_answer)
-        
-    # Get the final list of (Question, WrongAnswer) tuples
-    wrong_answers_list: List[Tuple[Question, WrongAnswer]] = list(unique_wrong_answers_map.values())
+    # Keep only the latest wrong answer of each question, most recently missed first
+    latest_query = select(Question, WrongAnswer).join(
+        ranked_subquery, WrongAnswer.id == ranked_subquery.c.id
+    ).join(
+        Question, Question.id == WrongAnswer.question_id
+    ).options(
+        joinedload(Question.question_set)
+    ).where(
+        ranked_subquery.c.latest_rank == 1
+    ).order_by(WrongAnswer.timestamp.desc(), WrongAnswer.id.desc())
+    
+    pagination: Page = paginate_rows(latest_query, page)
     
     return render_template('wrong_answer.html', 
-                           wrong_answers_list=wrong_answers_list, # Pass the new list
+                           pagination=pagination,
+                           set_id=set_id,
                            title=title)
 
 
 @app.route('/quiz_history')
 @login_required
 def quiz_history() -> str:
-    attempts: List[WrongAnswerSet] = WrongAnswerSet.query.filter_by(
-        user_id=current_user.id
-    ).order_by(WrongAnswerSet.timestamp.desc()).all()
-    
-    valid_attempts: List[WrongAnswerSet] = [a for a in attempts if a.wrong_answers]
-    return render_template('quiz_history.html', quiz_attempts=valid_attempts)
+    page: int = request.args.get('page', 1, type=int)
+    # One statement: each attempt with its set name and wrong-answer count, empty attempts left out
+    pagination: Page = paginate_rows(quiz_history_rows(current_user.id), page)
+    return render_template('quiz_history.html', pagination=pagination)
+
+@app.route('/stats')
+@login_required
+def stats() -> str:
+    page: int = request.args.get('page', 1, type=int)
+    # Both read the per-question statistics kept up to date by the quiz, see quiz_store.update_question_stats
+    summary: Row = db.session.execute(question_stats_summary(current_user.id)).one()
+    pagination: Page = paginate_rows(most_missed_questions(current_user.id), page)
+    return render_template('stats.html', summary=summary, pagination=pagination, mastered_streak=MASTERED_STREAK)
 
 @app.route('/quiz_history/<int:attempt_id>')
 @login_required
@@ -370,8 +323,9 @@ def quiz_history_detail(attempt_id: int) -> str:
 @app.route('/my_questions')
 @login_required
 def my_questions() -> str:
-    question_sets: List[QuestionSet] = QuestionSet.query.filter_by(user_id=current_user.id).order_by(QuestionSet.timestamp.desc()).all()
-    return render_template('my_questions.html', question_sets=question_sets)
+    page: int = request.args.get('page', 1, type=int)
+    pagination: Page = paginate_rows(question_sets_with_counts(current_user.id), page)
+    return render_template('my_questions.html', pagination=pagination)
 
 
 @app.route('/my_questions/<int:set_id>')
@@ -386,6 +340,73 @@ def my_questions_detail(set_id: int) -> str:
     return render_template('view_question_set_detail.html', questions=questions, set=question_set)
 
 
+def export_response(stmt: Select, export_format: str, file_name: str, columns: List[str] = EXPORT_COLUMNS) -> Response:
+    # Rows are read and sent while the download runs, see exporter.py
+    return Response(
+        stream_with_context(export_chunks(stmt, export_format, columns)),
+        mimetype=EXPORT_MIMETYPES[export_format],
+        headers={'Content-Disposition': f"attachment; filename=export.{export_format}; filename*=UTF-8''{quote(f'{file_name}.{export_format}')}"}
+    )
+
+
+@app.route('/my_questions/<int:set_id>/export')
+@login_required
+def export_question_set(set_id: int) -> Response:
+    export_format: str = request.args.get('format', 'xlsx')
+    question_set: Optional[QuestionSet] = db.session.get(QuestionSet, set_id)
+    if not question_set or question_set.user_id != current_user.id:
+        flash("未找到题集或无权访问。")
+        return redirect(url_for('my_questions'))
+    if export_format not in EXPORT_MIMETYPES:
+        flash("不支持的导出格式。")
+        return redirect(url_for('my_questions'))
+
+    return export_response(question_set_rows(set_id), export_format, question_set.name)
+
+
+@app.route('/wrong_answer/<set_id>/export')
+@login_required
+def export_wrong_answers(set_id: str) -> Response:
+    export_format: str = request.args.get('format', 'xlsx')
+    if export_format not in EXPORT_MIMETYPES:
+        flash("不支持的导出格式。")
+        return redirect(url_for('wrong_answer', set_id=set_id))
+
+    file_name: str = "所有错题"
+    selected_set_id: Optional[int] = None
+    if set_id != 'all':
+        try:
+            selected_set_id = int(set_id)
+        except ValueError:
+            flash("无效的题集ID。")
+            return redirect(url_for('wrong_answer_sets'))
+        set_data: Optional[QuestionSet] = db.session.get(QuestionSet, selected_set_id)
+        file_name = f'{set_data.name} 错题集' if set_data and set_data.user_id == current_user.id else "错题集"
+
+    # Only the user's own wrong answers are selected, whatever the set
+    return export_response(wrong_answer_rows(current_user.id, selected_set_id), export_format, file_name,
+                           EXPORT_COLUMNS + [SELECTED_ANSWER_COLUMN])
+
+
+@app.route('/search')
+@login_required
+def search() -> str:
+    query: str = request.args.get('q', '').strip()
+    set_id: Optional[int] = request.args.get('set_id', type=int)
+    page: int = request.args.get('page', 1, type=int)
+
+    # Indexed lookup over stems and options, see search.py. Common terms match a large part of the
+    # questions, so only the first MAX_COUNTED_RESULTS from the page on are counted.
+    pagination: Optional[Page] = None
+    if query:
+        pagination = paginate_rows(search_questions(current_user.id, query, set_id), page, max_total=MAX_COUNTED_RESULTS)
+
+    question_sets: List[Row] = list(db.session.execute(
+        select(QuestionSet.id, QuestionSet.name).where(QuestionSet.user_id == current_user.id).order_by(QuestionSet.name)
+    ).all())
+    return render_template('search.html', pagination=pagination, query=query, set_id=set_id, question_sets=question_sets)
+
+
 @app.route('/delete_confirm/<int:set_id>')
 @login_required
 def delete_question_set_confirm(set_id: int) -> str:
@@ -393,7 +414,10 @@ def delete_question_set_confirm(set_id: int) -> str:
     if not question_set or question_set.user_id != current_user.id:
         flash("未找到题集或无权访问。")
         return redirect(url_for('my_questions'))
-    return render_template('delete_confirm.html', set=question_set)
+    question_count: int = db.session.scalar(
+        select(db.func.count(Question.id)).where(Question.question_set_id == set_id)
+    ) or 0
+    return render_template('delete_confirm.html', set=question_set, question_count=question_count)
 
 
 @app.route('/delete_question_set/<int:set_id>', methods=['POST'])
@@ -407,6 +431,9 @@ def delete_question_set(set_id: int) -> str:
     set_name: str = question_set.name
     db.session.delete(question_set)
     db.session.commit()
+    invalidate_id_index(current_user.id)
+    # Quizzes still running on this set must not serve (and grade) its questions any longer
+    invalidate_attempt_cache()
     
     flash(f'题集 "{set_name}" 已被永久删除。')
     return redirect(url_for('my_questions'))
@@ -414,5 +441,9 @@ def delete_question_set(set_id: int) -> str:
 
 if __name__ == '__main__':
     with app.app_context():
-        db.create_all()
+        # Creates missing tables and indexes, see migrations.py
+        upgrade_database(db.engine)
+        sweep_idle_attempts(force=True)
+        # Import jobs run in this process, the ones of the previous run are gone
+        fail_stale_jobs(at_startup=True)
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,90 @@
+'''
+Simulated classroom load: many quiz takers reading questions and committing answers
+against one SQLite file, with SQLite's defaults versus the db_config tuning.
+
+Usage (from the GUI folder):
+    python benchmarks/bench_db_concurrency.py [quiz_takers] [seconds]
+'''
+from pathlib import Path
+from typing import Dict, List
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+import threading
+import tempfile
+import random
+import time
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from db_config import engine_options, install_sqlite_pragmas  # noqa: E402
+
+QUESTIONS: int = 5000
+
+
+def prepare(engine: Engine) -> None:
+    with engine.begin() as conn:
+        conn.execute(text('CREATE TABLE question (id INTEGER PRIMARY KEY, question_text TEXT, correct_answer TEXT)'))
+        conn.execute(text('CREATE TABLE answer (id INTEGER PRIMARY KEY, user_id INTEGER, question_id INTEGER, selected TEXT)'))
+        conn.execute(
+            text('INSERT INTO question (question_text, correct_answer) VALUES (:t, :a)'),
+            [{'t': f'question {i} ' + 'x' * 200, 'a': 'A'} for i in range(QUESTIONS)]
+        )
+
+
+def quiz_taker(engine: Engine, user_id: int, deadline: float, stats: Dict[str, int], lock: threading.Lock) -> None:
+    answers: int = 0
+    errors: int = 0
+    while time.perf_counter() < deadline:
+        try:
+            # Render a question, then grade it: one read and one write transaction, like quiz().
+            with engine.connect() as conn:
+                conn.execute(text('SELECT * FROM question WHERE id = :id'), {'id': random.randint(1, QUESTIONS)}).one()
+            with engine.begin() as conn:
+                conn.execute(
+                    text('INSERT INTO answer (user_id, question_id, selected) VALUES (:u, :q, :s)'),
+                    {'u': user_id, 'q': random.randint(1, QUESTIONS), 's': 'B'}
+                )
+            answers += 1
+        except OperationalError:
+            # "database is locked"
+            errors += 1
+    with lock:
+        stats['answers'] += answers
+        stats['errors'] += errors
+
+
+def run(tuned: bool, quiz_takers: int, seconds: float) -> Dict[str, int]:
+    with tempfile.TemporaryDirectory() as folder:
+        uri: str = 'sqlite:///' + str(Path(folder) / 'bench.db')
+        if tuned:
+            engine = create_engine(uri, **engine_options(uri))
+            install_sqlite_pragmas(engine)
+        else:
+            # What the app used before: rollback journal, synchronous=FULL, default pool.
+            engine = create_engine(uri)
+        prepare(engine)
+
+        stats: Dict[str, int] = {'answers': 0, 'errors': 0}
+        lock = threading.Lock()
+        deadline: float = time.perf_counter() + seconds
+        threads: List[threading.Thread] = [
+            threading.Thread(target=quiz_taker, args=(engine, user_id, deadline, stats, lock))
+            for user_id in range(quiz_takers)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        engine.dispose()
+        return stats
+
+
+if __name__ == '__main__':
+    QUIZ_TAKERS: int = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    SECONDS: float = float(sys.argv[2]) if len(sys.argv) > 2 else 5.0
+
+    for label, tuned in (('default', False), ('tuned (WAL)', True)):
+        result = run(tuned, QUIZ_TAKERS, SECONDS)
+        print(f"{label:>12}: {result['answers'] / SECONDS:8.1f} answers/s, "
+              f"{result['errors']} 'database is locked' errors ({QUIZ_TAKERS} quiz takers, {SECONDS:.0f}s)")
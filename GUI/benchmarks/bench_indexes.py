@@ -0,0 +1,113 @@
+'''
+Times the queries behind the listing routes on a synthetic database,
+first without the model indexes (as older databases have them) and then after
+`migrations.create_missing_indexes` added them.
+
+Usage (from the GUI folder):
+    python benchmarks/bench_indexes.py [users] [wrong_answers_per_user]
+'''
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.engine import Connection, Engine
+import tempfile
+import random
+import time
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from models import db  # noqa: E402
+from migrations import create_missing_indexes  # noqa: E402
+
+SETS_PER_USER: int = 10
+QUESTIONS_PER_SET: int = 100
+ATTEMPTS_PER_USER: int = 50
+REPEAT: int = 50
+
+# route -> (SQL, parameter builder)
+ROUTE_QUERIES: Dict[str, Tuple[str, Callable[[int], dict]]] = {
+    'quiz_history': (
+        'SELECT * FROM wrong_answer_set WHERE user_id = :user ORDER BY timestamp DESC',
+        lambda user: {'user': user}),
+    'my_questions': (
+        'SELECT * FROM question_set WHERE user_id = :user ORDER BY timestamp DESC',
+        lambda user: {'user': user}),
+    'start_quiz (id index)': (
+        'SELECT id, is_multiple_choice FROM question WHERE user_id = :user AND question_set_id = :set',
+        lambda user: {'user': user, 'set': (user - 1) * SETS_PER_USER + 1}),
+    'wrong_answer/all': (
+        'SELECT * FROM question JOIN wrong_answer ON question.id = wrong_answer.question_id '
+        'WHERE wrong_answer.user_id = :user ORDER BY wrong_answer.timestamp',
+        lambda user: {'user': user}),
+    'quiz_history_detail': (
+        'SELECT * FROM wrong_answer WHERE wrong_answer_set_id = :attempt',
+        lambda user: {'attempt': (user - 1) * ATTEMPTS_PER_USER + 1}),
+}
+
+
+def populate(engine: Engine, users: int, wrong_per_user: int) -> None:
+    db.metadata.create_all(engine)
+    with engine.begin() as conn:
+        # Start from an "old" database: drop every index the models declare.
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                conn.execute(text(f'DROP INDEX IF EXISTS {index.name}'))
+
+        conn.execute(text('INSERT INTO user (id, username, password) VALUES (:id, :name, :pw)'),
+                     [{'id': u, 'name': f'user{u}', 'pw': 'x'} for u in range(1, users + 1)])
+        conn.execute(text('INSERT INTO question_set (id, name, user_id, timestamp) VALUES (:id, :name, :user, :ts)'),
+                     [{'id': (u - 1) * SETS_PER_USER + s + 1, 'name': f'set{s}', 'user': u, 'ts': f'2025-01-{s + 1:02d}'}
+                      for u in range(1, users + 1) for s in range(SETS_PER_USER)])
+        conn.execute(text("INSERT INTO question (question_text, option_a, option_b, option_c, option_d, correct_answer, "
+                          "is_multiple_choice, user_id, question_set_id) VALUES (:t, 'a', 'b', 'c', 'd', 'A', :m, :user, :set)"),
+                     [{'t': f'question {q}', 'm': q % 4 == 0, 'user': (set_id - 1) // SETS_PER_USER + 1, 'set': set_id}
+                      for set_id in range(1, users * SETS_PER_USER + 1) for q in range(QUESTIONS_PER_SET)])
+        conn.execute(text('INSERT INTO wrong_answer_set (id, user_id, timestamp) VALUES (:id, :user, :ts)'),
+                     [{'id': (u - 1) * ATTEMPTS_PER_USER + a + 1, 'user': u, 'ts': f'2025-02-01 00:{a:02d}:00'}
+                      for u in range(1, users + 1) for a in range(ATTEMPTS_PER_USER)])
+
+        questions_per_user: int = SETS_PER_USER * QUESTIONS_PER_SET
+        rows: List[dict] = []
+        for u in range(1, users + 1):
+            for i in range(wrong_per_user):
+                rows.append({
+                    'q': (u - 1) * questions_per_user + random.randint(1, questions_per_user),
+                    'user': u,
+                    'set': (u - 1) * ATTEMPTS_PER_USER + i % ATTEMPTS_PER_USER + 1,
+                    'ts': f'2025-02-01 00:00:{i % 60:02d}',
+                })
+        conn.execute(text("INSERT INTO wrong_answer (question_id, selected_answer, user_id, wrong_answer_set_id, timestamp) "
+                          "VALUES (:q, 'B', :user, :set, :ts)"), rows)
+
+
+def time_routes(conn: Connection, users: int) -> Dict[str, float]:
+    timings: Dict[str, float] = {}
+    for route, (sql, params) in ROUTE_QUERIES.items():
+        start: float = time.perf_counter()
+        for _ in range(REPEAT):
+            conn.execute(text(sql), params(random.randint(1, users))).all()
+        timings[route] = (time.perf_counter() - start) / REPEAT * 1000
+    return timings
+
+
+if __name__ == '__main__':
+    USERS: int = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    WRONG_PER_USER: int = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+
+    with tempfile.TemporaryDirectory() as folder:
+        engine: Engine = create_engine('sqlite:///' + str(Path(folder) / 'bench.db'))
+        populate(engine, USERS, WRONG_PER_USER)
+        print(f"{USERS} users, {USERS * SETS_PER_USER * QUESTIONS_PER_SET} questions, "
+              f"{USERS * WRONG_PER_USER} wrong answers")
+
+        with engine.connect() as conn:
+            before: Dict[str, float] = time_routes(conn, USERS)
+        created: List[str] = create_missing_indexes(engine)
+        with engine.connect() as conn:
+            after: Dict[str, float] = time_routes(conn, USERS)
+
+        print(f"created {len(created)} indexes, {len(inspect(engine).get_indexes('wrong_answer'))} on wrong_answer\n")
+        print(f"{'route':<24}{'before (ms)':>12}{'after (ms)':>12}")
+        for route in ROUTE_QUERIES:
+            print(f"{route:<24}{before[route]:>12.2f}{after[route]:>12.2f}")
+        engine.dispose()
@@ -0,0 +1,90 @@
+'''
+Times one page of `/search` results on a synthetic database: LIKE scans (no search index)
+with a full count, as before the index, against the FTS5 trigram index that
+`migrations.upgrade_database` creates with the capped count `/search` uses, and checks
+that both agree on the total (up to the cap).
+
+Usage (from the GUI folder):
+    python benchmarks/bench_search.py [questions]
+'''
+from pathlib import Path
+from typing import List, Optional
+import tempfile
+import random
+import time
+import sys
+import os
+
+TMP_DIR = tempfile.TemporaryDirectory()
+# Must be set before the app is imported
+os.environ['DATABASE_URL'] = f'sqlite:///{Path(TMP_DIR.name) / "bench.db"}'
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from sqlalchemy import text  # noqa: E402
+from app import app  # noqa: E402
+from models import db  # noqa: E402
+from migrations import upgrade_database  # noqa: E402
+from pagination import paginate_rows  # noqa: E402
+import search  # noqa: E402
+
+USERS: int = 3
+SETS_PER_USER: int = 10
+REPEAT: int = 20
+WORDS: List[str] = ['数据库', '索引', '事务', '隔离级别', '操作系统', '进程', '线程', '死锁', '内存', '页面置换',
+                    '网络', '协议', '路由', '拥塞控制', '编译', '语法分析', '寄存器', '缓存', '一致性', '哈希表']
+# Common words (a fifth of all rows) and a rare number
+QUERIES: List[str] = ['隔离级别', '页面置换 死锁', '拥塞控制 缓存 协议', '索引', '4821']
+
+
+def populate(questions: int) -> None:
+    rng = random.Random(7)
+
+    def sentence(length: int) -> str:
+        return '，'.join(''.join(rng.choices(WORDS, k=3)) for _ in range(length)) + f'（{rng.randint(1, 10 ** 6)}）'
+
+    with db.engine.begin() as conn:
+        conn.execute(text('INSERT INTO user (id, username, password) VALUES (:id, :name, :pw)'),
+                     [{'id': u, 'name': f'user{u}', 'pw': 'x'} for u in range(1, USERS + 1)])
+        conn.execute(text('INSERT INTO question_set (id, name, user_id) VALUES (:id, :name, :user)'),
+                     [{'id': (u - 1) * SETS_PER_USER + s + 1, 'name': f'set{s}', 'user': u}
+                      for u in range(1, USERS + 1) for s in range(SETS_PER_USER)])
+        conn.execute(text(
+            'INSERT INTO question (question_text, option_a, option_b, option_c, option_d, correct_answer, '
+            'is_multiple_choice, user_id, question_set_id) VALUES (:q, :a, :b, :c, :d, :ans, 0, :user, :set)'
+        ), [
+            {'q': sentence(3), 'a': sentence(1), 'b': sentence(1), 'c': sentence(1), 'd': sentence(1), 'ans': 'A',
+             'user': i % USERS + 1, 'set': (i % USERS) * SETS_PER_USER + i % SETS_PER_USER + 1}
+            for i in range(questions)
+        ])
+
+
+def time_search(query: str, max_total: Optional[int] = None, set_id: Optional[int] = None) -> tuple:
+    start: float = time.perf_counter()
+    for _ in range(REPEAT):
+        page = paginate_rows(search.search_questions(1, query, set_id), 1, max_total=max_total)
+    return (time.perf_counter() - start) / REPEAT * 1000, page.total, page.total_capped
+
+
+if __name__ == '__main__':
+    QUESTIONS: int = int(sys.argv[1]) if len(sys.argv) > 1 else 300_000
+
+    with app.app_context():
+        db.create_all()
+        populate(QUESTIONS)
+
+        # Scans first, then build the index the way an upgrade does
+        search._index_present[str(db.engine.url)] = False
+        scans = {(query, set_id): time_search(query, set_id=set_id) for query in QUERIES for set_id in (None, 1)}
+
+        start: float = time.perf_counter()
+        upgrade_database(db.engine)
+        print(f"{QUESTIONS} questions, index built in {time.perf_counter() - start:.1f}s")
+
+        for (query, set_id), (scan_ms, scan_total, _) in scans.items():
+            indexed_ms, indexed_total, capped = time_search(query, search.MAX_COUNTED_RESULTS, set_id)
+            assert indexed_total == min(scan_total, search.MAX_COUNTED_RESULTS) and capped == (scan_total > indexed_total), \
+                f"'{query}': {indexed_total} hits with the index, {scan_total} with LIKE"
+            label: str = f"{query!r}" + (f" in set {set_id}" if set_id else '')
+            print(f"{label:<30} {scan_total:>7} hits | LIKE: {scan_ms:8.1f} ms | FTS5: {indexed_ms:7.1f} ms | "
+                  f"x{scan_ms / indexed_ms:.1f}")
+        db.engine.dispose()
@@ -0,0 +1,110 @@
+'''
+Checks that the listing pages run a constant number of queries, no matter how many
+sets, questions and quiz attempts a user has (no N+1 lazy loads).
+
+Usage (from the GUI folder):
+    python benchmarks/check_query_counts.py
+
+The same check runs as a test, see tests/test_query_counts.py.
+'''
+from pathlib import Path
+from typing import Dict, List, Tuple
+import tempfile
+import os
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Upper bound per page: login lookup + list query + count query, with some slack.
+MAX_QUERIES: Dict[str, int] = {
+    '/': 3,
+    '/my_questions': 4,
+    '/quiz_history': 4,
+    '/wrong_answer/all': 4,
+    '/wrong_answer_sets': 3,
+    '/stats': 4,
+}
+
+
+def add_data(user_id: int, sets: int, questions_per_set: int) -> None:
+    '''Adds `sets` question sets, each with one quiz attempt that got every question wrong.'''
+    from models import db, Question, QuestionSet, WrongAnswer, WrongAnswerSet
+
+    for _ in range(sets):
+        question_set = QuestionSet(name='bank.xlsx', user_id=user_id)
+        db.session.add(question_set)
+        db.session.flush()
+        attempt = WrongAnswerSet(user_id=user_id, question_set_id=question_set.id)
+        db.session.add(attempt)
+        db.session.flush()
+        for i in range(questions_per_set):
+            question = Question(f'Q{i}', 'a', 'b', 'c', 'd', 'A', False, user_id, question_set.id)
+            db.session.add(question)
+            db.session.flush()
+            db.session.add(WrongAnswer(question.id, 'B', user_id, attempt.id))
+    db.session.commit()
+
+
+def measure(client, engine) -> Dict[str, int]:
+    '''
+    Request every page and count its statements. Must run outside an app context: each request
+    then pushes its own, with a fresh session, so nothing is served from an identity map a
+    previous request (or the test setup) filled, just like in production.
+    '''
+    from flask import has_app_context
+    from query_audit import count_queries
+
+    assert not has_app_context(), 'measure() needs a fresh app context (and session) per request'
+    counts: Dict[str, int] = {}
+    for path in MAX_QUERIES:
+        with count_queries(engine) as counter:
+            response = client.get(path)
+        assert response.status_code == 200, f'{path} returned {response.status_code}'
+        counts[path] = counter.count
+    return counts
+
+
+def collect_counts(database_url: str) -> Dict[str, Tuple[int, int]]:
+    '''
+    Statement counts of every page in `MAX_QUERIES` for a small and a large account,
+    on a new database at `database_url`.
+    Returns:
+        {path: (small, large)}
+    '''
+    # Must be set before the app is imported
+    os.environ['DATABASE_URL'] = database_url
+    from app import app
+    from models import db
+    from migrations import upgrade_database
+
+    app.config['TESTING'] = True
+    client = app.test_client()
+    with app.app_context():
+        upgrade_database(db.engine)
+        engine = db.engine
+    client.post('/register', data={'username': 'audit', 'password': 'audit'})
+
+    results: List[Dict[str, int]] = []
+    for sets, questions in ((2, 3), (20, 30)):
+        with app.app_context():
+            add_data(1, sets, questions)
+        results.append(measure(client, engine))
+
+    engine.dispose()
+    return {path: (results[0][path], results[1][path]) for path in MAX_QUERIES}
+
+
+def check(counts: Dict[str, Tuple[int, int]]) -> List[str]:
+    '''Pages whose count grows with the data or exceeds their limit.'''
+    return [path for path, (small, large) in counts.items() if small != large or large > MAX_QUERIES[path]]
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as folder:
+        counts: Dict[str, Tuple[int, int]] = collect_counts('sqlite:///' + str(Path(folder) / 'check.db'))
+
+    failed: List[str] = check(counts)
+    for path, (small, large) in counts.items():
+        print(f"{'FAIL' if path in failed else 'ok  '} {path:<20} {small} queries (small) / {large} queries (large), "
+              f"limit {MAX_QUERIES[path]}")
+    sys.exit(1 if failed else 0)
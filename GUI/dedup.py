@@ -0,0 +1,148 @@
+'''
+Question fingerprints and near-duplicate detection.
+
+Exact duplicates: every question gets a fingerprint of its normalized text (case, width,
+whitespace and punctuation do not count), indexed per user, so an import can skip the
+questions a user already has with one indexed lookup per chunk.
+
+Near duplicates (OCR noise, a character or two off): MinHash signatures of the character
+shingles, bucketed with banded LSH, so only questions sharing a band are compared (by their
+exact shingle similarity) instead of every pair.
+
+Usage (from the GUI folder, lists the near-duplicate groups of a user):
+    python dedup.py <user id> [similarity, default 0.8]
+'''
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+import numpy as np
+import unicodedata
+import hashlib
+import re
+
+# Everything that is not a letter or a digit (whitespace, punctuation, symbols)
+_NOISE_RE = re.compile(r'[\W_]+')
+
+# Shingle size in characters (Chinese text has no word boundaries)
+SHINGLE_SIZE: int = 3
+# 64 hash functions in 16 bands of 4: pairs above ~0.5 similarity become candidates,
+# pairs at 0.8 are found with a probability above 99.9%.
+MINHASH_PERMUTATIONS: int = 64
+LSH_BANDS: int = 16
+DEFAULT_SIMILARITY: float = 0.8
+
+_rng = np.random.default_rng(20240607)
+# (a * x + b) mod 2^64 with odd a, one column per hash function; fixed seed so signatures are stable
+_MINHASH_A = _rng.integers(1, 2 ** 63, MINHASH_PERMUTATIONS, dtype=np.uint64) | np.uint64(1)
+_MINHASH_B = _rng.integers(0, 2 ** 63, MINHASH_PERMUTATIONS, dtype=np.uint64)
+
+
+def normalize_text(text: Optional[str]) -> str:
+    '''Fold width and case and drop whitespace and punctuation: "Ａ． 数据库" -> "a数据库".'''
+    if not text:
+        return ''
+    return _NOISE_RE.sub('', unicodedata.normalize('NFKC', str(text)).casefold())
+
+
+def question_fingerprint(question_text: Optional[str], option_a: Optional[str], option_b: Optional[str],
+                         option_c: Optional[str], option_d: Optional[str]) -> str:
+    '''128-bit hex fingerprint of a question's normalized stem and options (options keep their letters).'''
+    key: str = '\x1f'.join(normalize_text(part) for part in (question_text, option_a, option_b, option_c, option_d))
+    return hashlib.blake2b(key.encode('utf-8'), digest_size=16).hexdigest()
+
+
+# --- Near duplicates ---
+
+def shingle_set(text: str) -> Set[str]:
+    '''The overlapping `SHINGLE_SIZE`-character pieces of the normalized text.'''
+    normalized: str = normalize_text(text)
+    if len(normalized) <= SHINGLE_SIZE:
+        return {normalized}
+    return {normalized[i:i + SHINGLE_SIZE] for i in range(len(normalized) - SHINGLE_SIZE + 1)}
+
+
+def minhash_signature(shingles: Set[str]) -> np.ndarray:
+    '''Smallest hash of the shingles under each of the `MINHASH_PERMUTATIONS` hash functions.'''
+    digests: bytes = b''.join(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest() for shingle in shingles)
+    values = np.frombuffer(digests, dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        return (values[:, None] * _MINHASH_A + _MINHASH_B).min(axis=0)
+
+
+def jaccard(first: Set[str], second: Set[str]) -> float:
+    return len(first & second) / len(first | second) if first or second else 1.0
+
+
+def _find(parents: Dict[int, int], item: int) -> int:
+    while parents[item] != item:
+        parents[item] = parents[parents[item]]
+        item = parents[item]
+    return item
+
+
+def near_duplicate_groups(items: Iterable[Tuple[int, str]], similarity: float = DEFAULT_SIMILARITY) -> List[List[int]]:
+    '''
+    Group ids whose texts share at least `similarity` of their shingles (Jaccard).
+    Each signature is cut into `LSH_BANDS` bands; only ids with an identical band land in the
+    same bucket and get compared, so the cost grows with the number of candidates, not n².
+    Args:
+        items: (id, text) pairs.
+    Returns:
+        Groups of two or more ids, each sorted, smallest id first.
+    '''
+    shingles: Dict[int, Set[str]] = {}
+    buckets: Dict[Tuple[int, bytes], List[int]] = {}
+    rows_per_band: int = MINHASH_PERMUTATIONS // LSH_BANDS
+
+    for item_id, text in items:
+        shingles[item_id] = shingle_set(text)
+        signature: np.ndarray = minhash_signature(shingles[item_id])
+        for band in range(LSH_BANDS):
+            key: bytes = signature[band * rows_per_band:(band + 1) * rows_per_band].tobytes()
+            buckets.setdefault((band, key), []).append(item_id)
+
+    parents: Dict[int, int] = {item_id: item_id for item_id in shingles}
+    compared: Set[Tuple[int, int]] = set()
+    for bucket in buckets.values():
+        for i, first in enumerate(bucket):
+            for second in bucket[i + 1:]:
+                if (first, second) in compared:
+                    continue
+                compared.add((first, second))
+                if jaccard(shingles[first], shingles[second]) >= similarity:
+                    parents[_find(parents, first)] = _find(parents, second)
+
+    groups: Dict[int, List[int]] = {}
+    for item_id in shingles:
+        groups.setdefault(_find(parents, item_id), []).append(item_id)
+    return sorted((sorted(group) for group in groups.values() if len(group) > 1), key=lambda group: group[0])
+
+
+def question_text_for_hash(row: Sequence[Optional[str]]) -> str:
+    '''Stem and options of a (question_text, option_a, ..., option_d) row, as one text.'''
+    return ' '.join(part or '' for part in row)
+
+
+if __name__ == '__main__':
+    import sys
+    from sqlalchemy import select
+    from app import app
+    from models import db, Question
+
+    if len(sys.argv) < 2:
+        sys.exit('Usage: python dedup.py <user id> [similarity]')
+
+    user_id: int = int(sys.argv[1])
+    similarity: float = float(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_SIMILARITY
+
+    with app.app_context():
+        rows = db.session.execute(
+            select(Question.id, Question.question_text, Question.option_a, Question.option_b,
+                   Question.option_c, Question.option_d).where(Question.user_id == user_id)
+        ).all()
+        texts: Dict[int, str] = {row[0]: question_text_for_hash(row[1:]) for row in rows}
+
+        groups: List[List[int]] = near_duplicate_groups(texts.items(), similarity)
+        print(f"{len(rows)} questions, {len(groups)} near-duplicate groups (similarity >= {similarity})")
+        for group in groups:
+            print(f"\n  ids {', '.join(map(str, group))}")
+            for question_id in group:
+                print(f"    [{question_id}] {texts[question_id][:80]}")
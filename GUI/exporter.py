@@ -0,0 +1,127 @@
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+from openpyxl import Workbook
+from sqlalchemy import Select, select
+from models import db, Question, WrongAnswer
+from listings import latest_wrong_answers
+from importer import REQUIRED_COLUMNS
+import tempfile
+import json
+import csv
+import io
+
+# Exports stream plain column rows (no ORM objects) from a server-side cursor
+# and hand the response out in chunks, so memory stays flat for any set size.
+
+# Rows fetched from the database per round trip
+EXPORT_YIELD_PER: int = 1000
+# Rows collected before a chunk of CSV/JSONL text is sent
+ROWS_PER_CHUNK: int = 500
+# Bytes per chunk when sending the finished .xlsx file
+FILE_CHUNK_SIZE: int = 64 * 1024
+
+# Same columns as an import (see importer.REQUIRED_COLUMNS), so an export can be uploaded again.
+EXPORT_COLUMNS: List[str] = REQUIRED_COLUMNS
+# Extra column of wrong-answer exports (ignored by the importer)
+SELECTED_ANSWER_COLUMN: str = '你的答案'
+
+EXPORT_MIMETYPES: Dict[str, str] = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+
+_QUESTION_FIELDS = (
+    Question.question_text, Question.option_a, Question.option_b, Question.option_c,
+    Question.option_d, Question.correct_answer, Question.is_multiple_choice,
+)
+
+
+def question_set_rows(set_id: int) -> Select:
+    '''Rows of the `EXPORT_COLUMNS` fields of a set's questions, in insertion order.'''
+    return select(*_QUESTION_FIELDS).where(Question.question_set_id == set_id).order_by(Question.id)
+
+
+def wrong_answer_rows(user_id: int, set_id: Optional[int] = None) -> Select:
+    '''Rows of the `EXPORT_COLUMNS` fields plus the selected answer, one per question (its latest wrong answer).'''
+    ranked = latest_wrong_answers(user_id, set_id)
+    return select(*_QUESTION_FIELDS, WrongAnswer.selected_answer).join(
+        ranked, WrongAnswer.id == ranked.c.id
+    ).join(
+        Question, Question.id == WrongAnswer.question_id
+    ).where(
+        ranked.c.latest_rank == 1
+    ).order_by(WrongAnswer.timestamp.desc(), WrongAnswer.id.desc())
+
+
+def _iter_rows(stmt: Select) -> Iterator[List[Any]]:
+    '''Rows of `stmt` as lists, with '是否多选' written as 是/否 (what the importer reads back).'''
+    result = db.session.execute(stmt.execution_options(yield_per=EXPORT_YIELD_PER))
+    for row in result:
+        values: List[Any] = list(row)
+        values[6] = '是' if values[6] else '否'
+        yield values
+
+
+def iter_csv(stmt: Select, columns: Sequence[str]) -> Iterator[bytes]:
+    # UTF-8 with BOM, so Excel detects the encoding of the Chinese text
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue().encode('utf-8-sig')
+
+    count: int = 0
+    buffer.seek(0)
+    buffer.truncate()
+    for values in _iter_rows(stmt):
+        writer.writerow(values)
+        count += 1
+        if count % ROWS_PER_CHUNK == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def iter_jsonl(stmt: Select, columns: Sequence[str]) -> Iterator[bytes]:
+    lines: List[str] = []
+    for values in _iter_rows(stmt):
+        lines.append(json.dumps(dict(zip(columns, values)), ensure_ascii=False))
+        if len(lines) >= ROWS_PER_CHUNK:
+            yield ('\n'.join(lines) + '\n').encode('utf-8')
+            lines = []
+    if lines:
+        yield ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+def iter_xlsx(stmt: Select, columns: Sequence[str]) -> Iterator[bytes]:
+    '''
+    A .xlsx file is a zip archive that is only complete once every row is in, so the rows go into
+    a write-only workbook (kept in temporary files, not in memory) and the saved file is then sent in chunks.
+    '''
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('题目')
+    sheet.append(list(columns))
+    for values in _iter_rows(stmt):
+        sheet.append(values)
+
+    with tempfile.TemporaryFile() as file:
+        workbook.save(file)
+        file.seek(0)
+        while chunk := file.read(FILE_CHUNK_SIZE):
+            yield chunk
+
+
+EXPORT_WRITERS = {
+    'csv': iter_csv,
+    'xlsx': iter_xlsx,
+    'jsonl': iter_jsonl,
+}
+
+
+def export_chunks(stmt: Select, export_format: str, columns: Sequence[str] = EXPORT_COLUMNS) -> Iterator[bytes]:
+    '''
+    Stream `stmt` as `export_format` ('csv', 'xlsx' or 'jsonl').
+    Must run inside the app context, wrap it in `stream_with_context` when returning it from a view.
+    '''
+    return EXPORT_WRITERS[export_format](stmt, columns)
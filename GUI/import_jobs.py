@@ -0,0 +1,172 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Union
+from flask import Flask
+from werkzeug.datastructures import FileStorage
+from sqlalchemy import delete, select, update
+from models import db, ImportJob, Question, QuestionSet
+from importer import ImportFormatError, iter_question_frames, bulk_insert_questions
+from sampling import invalidate_id_index
+import tempfile
+import os
+
+# Number of imports that may run at the same time (app.config['IMPORT_WORKERS'] overrides it).
+DEFAULT_IMPORT_WORKERS: int = 2
+
+# Jobs live in this process's thread pool, so a restart leaves them queued/running for good.
+# Running jobs without any progress for this long are treated as lost (a 5000-row chunk takes seconds).
+STALE_JOB_TIMEOUT: timedelta = timedelta(minutes=30)
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _get_executor(app: Flask) -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=app.config.get('IMPORT_WORKERS', DEFAULT_IMPORT_WORKERS),
+            thread_name_prefix='import-job'
+        )
+    return _executor
+
+
+def submit_import(app: Flask, file: FileStorage, user_id: int) -> ImportJob:
+    '''
+    Save the upload to a temporary file, record a queued job and hand it to the worker pool.
+    Returns immediately; poll the job row (see `job_progress`) to follow it.
+    '''
+    fd, upload_path = tempfile.mkstemp(suffix='.xlsx', prefix='import_')
+    with os.fdopen(fd, 'wb') as tmp:
+        file.save(tmp)
+
+    job = ImportJob(user_id=user_id, file_name=str(file.filename))
+    db.session.add(job)
+    db.session.commit()
+
+    _get_executor(app).submit(_run_import_job, app, job.id, upload_path)
+    return job
+
+
+def _utcnow() -> datetime:
+    # Same clock as the server_default=func.now() timestamps SQLite writes (naive UTC).
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _update_job(job_id: int, **values: Union[int, str, None]) -> None:
+    db.session.execute(update(ImportJob).where(ImportJob.id == job_id).values(updated_at=_utcnow(), **values))
+
+
+def _discard_question_set(question_set_id: Optional[int]) -> None:
+    if question_set_id is None:
+        return
+    db.session.execute(delete(Question).where(Question.question_set_id == question_set_id))
+    db.session.execute(delete(QuestionSet).where(QuestionSet.id == question_set_id))
+
+
+def fail_stale_jobs(job_ids: Optional[List[int]] = None, at_startup: bool = False) -> int:
+    '''
+    Mark jobs whose worker is gone as failed and remove their partial question sets, then commit:
+    running jobs without progress for `STALE_JOB_TIMEOUT`, and at startup every queued or running job.
+    Queued jobs are not timed out otherwise, they may wait for a free worker for any length of time.
+    Args:
+        job_ids: Only look at these jobs (e.g. the one being polled); all jobs when omitted.
+        at_startup: No job of this process exists yet, the unfinished ones belong to the previous run.
+    Returns:
+        The number of jobs failed.
+    '''
+    if at_startup:
+        conditions = [ImportJob.status.in_(['queued', 'running'])]
+    else:
+        conditions = [ImportJob.status == 'running', ImportJob.updated_at <= _utcnow() - STALE_JOB_TIMEOUT]
+    if job_ids is not None:
+        conditions.append(ImportJob.id.in_(job_ids))
+
+    failed: int = 0
+    for job_id, question_set_id in db.session.execute(select(ImportJob.id, ImportJob.question_set_id).where(*conditions)).all():
+        # Same conditions again, so a job that moved on in the meantime is left alone
+        result = db.session.execute(update(ImportJob).where(ImportJob.id == job_id, *conditions).values(
+            status='failed', question_set_id=None, updated_at=_utcnow(), error_message='导入已中断, 请重新上传文件。'
+        ))
+        if result.rowcount:
+            _discard_question_set(question_set_id)
+            failed += 1
+    if failed:
+        db.session.commit()
+    return failed
+
+
+def _claim_job(job_id: int) -> bool:
+    '''Switch a queued job to running, atomically. False when the job is gone or no longer queued.'''
+    result = db.session.execute(
+        update(ImportJob).where(ImportJob.id == job_id, ImportJob.status == 'queued').values(
+            status='running', updated_at=_utcnow()
+        )
+    )
+    db.session.commit()
+    return bool(result.rowcount)
+
+
+def _run_import_job(app: Flask, job_id: int, upload_path: str) -> None:
+    '''Parse and insert one upload. Runs on a worker thread with its own app context and session.'''
+    with app.app_context():
+        question_set_id: Optional[int] = None
+        try:
+            # A job that is no longer queued (e.g. failed by `fail_stale_jobs`) must not run
+            if not _claim_job(job_id):
+                return
+
+            job: ImportJob = db.session.get(ImportJob, job_id)
+            user_id: int = job.user_id
+            question_set = QuestionSet(name=job.file_name, user_id=user_id)
+            db.session.add(question_set)
+            db.session.flush()
+            question_set_id = question_set.id
+            _update_job(job_id, question_set_id=question_set_id)
+            db.session.commit()
+
+            def report(parsed: int, inserted: int, duplicates: int) -> None:
+                # Each chunk is committed together with its progress, so pollers see it right away.
+                _update_job(
+                    job_id,
+                    rows_parsed=ImportJob.rows_parsed + parsed,
+                    rows_inserted=ImportJob.rows_inserted + inserted,
+                    duplicate_count=ImportJob.duplicate_count + duplicates,
+                    error_count=ImportJob.error_count + (parsed - inserted - duplicates)
+                )
+                db.session.commit()
+
+            with open(upload_path, 'rb') as upload:
+                imported_count: int = bulk_insert_questions(
+                    iter_question_frames(upload), user_id, question_set_id, on_chunk=report,
+                    skip_duplicates=app.config.get('DEDUP_ON_IMPORT', True)
+                )
+            if imported_count == 0:
+                raise ImportFormatError('Excel 文件为空或无法读取题目。')
+
+            _update_job(job_id, status='finished', question_set_id=question_set_id)
+            db.session.commit()
+            invalidate_id_index(user_id)
+        except Exception as e:
+            db.session.rollback()
+            # Drop whatever chunks made it in, the set is only kept for complete imports.
+            _discard_question_set(question_set_id)
+            message: str = str(e) if isinstance(e, ImportFormatError) else f'发生错误: {e}'
+            _update_job(job_id, status='failed', question_set_id=None, error_message=message[:1000])
+            db.session.commit()
+        finally:
+            os.remove(upload_path)
+
+
+def job_progress(job: ImportJob) -> Dict[str, Union[int, str, None]]:
+    '''JSON-friendly snapshot of a job, served by the progress endpoint.'''
+    return {
+        'id': job.id,
+        'file_name': job.file_name,
+        'status': job.status,
+        'rows_parsed': job.rows_parsed,
+        'rows_inserted': job.rows_inserted,
+        'error_count': job.error_count,
+        'duplicate_count': job.duplicate_count,
+        'error_message': job.error_message,
+        'question_set_id': job.question_set_id,
+    }
@@ -0,0 +1,141 @@
+from typing import IO, Any, Callable, Iterator, List, Dict, Optional, Set
+from openpyxl import load_workbook
+from models import db, Question
+from dedup import question_fingerprint
+import pandas as pd
+
+# Columns every uploaded question bank must provide (header row of the first sheet).
+REQUIRED_COLUMNS: List[str] = ['题目', 'A', 'B', 'C', 'D', '正确答案', '是否多选']
+
+# Values of the '是否多选' column that mean "multiple choice".
+TRUTHY_VALUES: List[str] = ['true', 't', 'yes', 'y', '1', '1.0', '是', '多选', '√']
+
+# Rows are parsed, normalized and inserted in chunks of this size,
+# so memory stays bounded no matter how large the workbook is.
+DEFAULT_CHUNK_SIZE: int = 5000
+
+
+class ImportFormatError(ValueError):
+    '''Raised when an uploaded workbook cannot be imported as a question bank.'''
+
+
+def iter_question_frames(file: IO[bytes], chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    '''
+    Stream the first sheet of an .xlsx upload in read-only mode.
+    Args:
+        file: The uploaded file object (anything openpyxl can open).
+        chunk_size: Number of rows per yielded DataFrame.
+    Yields:
+        Raw DataFrames holding the required columns, `chunk_size` rows at a time.
+    '''
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        if not workbook.worksheets:
+            raise ImportFormatError('Excel 文件为空或无法读取题目。')
+
+        rows: Iterator[tuple] = workbook.worksheets[0].iter_rows(values_only=True)
+        header_row: tuple = next(rows, ())
+        header: List[str] = [str(cell).strip() if cell is not None else '' for cell in header_row]
+
+        missing: List[str] = [col for col in REQUIRED_COLUMNS if col not in header]
+        if missing:
+            raise ImportFormatError(f'Excel 文件必须包含以下列: {", ".join(REQUIRED_COLUMNS)}')
+
+        # Only keep the cells we need, in REQUIRED_COLUMNS order.
+        positions: List[int] = [header.index(col) for col in REQUIRED_COLUMNS]
+        width: int = len(header)
+
+        buffer: List[List[Any]] = []
+        for row in rows:
+            if len(row) < width:
+                row = tuple(row) + (None,) * (width - len(row))
+            buffer.append([row[i] for i in positions])
+            if len(buffer) >= chunk_size:
+                yield pd.DataFrame(buffer, columns=REQUIRED_COLUMNS)
+                buffer = []
+
+        if buffer:
+            yield pd.DataFrame(buffer, columns=REQUIRED_COLUMNS)
+    finally:
+        workbook.close()
+
+
+def _text_column(series: pd.Series) -> pd.Series:
+    '''Turn a raw cell column into stripped strings, blank cells become "".'''
+    return series.where(series.notna(), '').astype(str).str.strip()
+
+
+def normalize_question_frame(df: pd.DataFrame) -> pd.DataFrame:
+    '''
+    Validate and normalize one chunk of raw rows with column-wise operations.
+    Rows without a question text (e.g. trailing empty rows) are dropped.
+    Returns:
+        A DataFrame whose columns are named after the `Question` table columns.
+    '''
+    normalized = pd.DataFrame({
+        'question_text': _text_column(df['题目']),
+        'option_a': _text_column(df['A']),
+        'option_b': _text_column(df['B']),
+        'option_c': _text_column(df['C']),
+        'option_d': _text_column(df['D']),
+        'correct_answer': _text_column(df['正确答案']).str.upper(),
+    })
+
+    # Booleans, 1/0 and text flags such as "是" all end up as lower-case strings here.
+    normalized['is_multiple_choice'] = _text_column(df['是否多选']).str.lower().isin(TRUTHY_VALUES)
+
+    return normalized[normalized['question_text'] != ''].reset_index(drop=True)
+
+
+def count_blank_rows(df: pd.DataFrame) -> int:
+    '''Rows of a raw chunk without any content (e.g. trailing formatted but empty rows).'''
+    return int(pd.DataFrame({col: _text_column(df[col]) for col in REQUIRED_COLUMNS}).eq('').all(axis=1).sum())
+
+
+def bulk_insert_questions(frames: Iterator[pd.DataFrame], user_id: int, question_set_id: int,
+                          on_chunk: Optional[Callable[[int, int, int], None]] = None,
+                          skip_duplicates: bool = True) -> int:
+    '''
+    Normalize every chunk and insert it with a single Core executemany per chunk.
+    The caller owns the transaction (nothing is committed here).
+    Args:
+        on_chunk: Optional progress callback, called after every chunk with
+                  (rows parsed in this chunk, rows inserted from this chunk, duplicates skipped in this chunk).
+                  Blank rows are not counted as parsed, so parsed - inserted - duplicates are the rows
+                  that were dropped for having no question text.
+        skip_duplicates: Leave out questions that appear earlier in the same upload, by fingerprint
+                         (see dedup.py). Questions the user has in other sets are kept: the new set
+                         must hold all of its questions for quizzes and exports of that set.
+    Returns:
+        The number of inserted questions.
+    '''
+    inserted: int = 0
+    table = Question.__table__
+    # Fingerprints inserted by this upload so far
+    seen: Set[str] = set()
+
+    for raw in frames:
+        frame: pd.DataFrame = normalize_question_frame(raw)
+        duplicates: int = 0
+        if not frame.empty:
+            frame['fingerprint'] = [
+                question_fingerprint(*row) for row in zip(
+                    frame['question_text'], frame['option_a'], frame['option_b'], frame['option_c'], frame['option_d']
+                )
+            ]
+            if skip_duplicates:
+                keep = ~frame['fingerprint'].isin(seen) & ~frame['fingerprint'].duplicated()
+                duplicates = int((~keep).sum())
+                frame = frame[keep]
+                seen.update(frame['fingerprint'])
+
+        if not frame.empty:
+            rows: List[Dict[str, Any]] = frame.assign(user_id=user_id, question_set_id=question_set_id).to_dict('records')
+
+            db.session.execute(table.insert(), rows)
+            inserted += len(rows)
+
+        if on_chunk:
+            on_chunk(len(raw) - count_blank_rows(raw), len(frame), duplicates)
+
+    return inserted
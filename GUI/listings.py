@@ -0,0 +1,80 @@
+from typing import Optional
+from sqlalchemy import Select, Subquery, func, select
+from models import Question, QuestionSet, UserQuestionStats, WrongAnswer, WrongAnswerSet
+
+# Aggregated list queries: every row carries its counts and names,
+# so the listing templates never touch lazy relationships.
+
+# Right answers in a row after which a question counts as mastered
+MASTERED_STREAK: int = 3
+
+
+def question_sets_with_counts(user_id: int) -> Select:
+    '''Rows of (QuestionSet, question_count) for a user, newest first.'''
+    question_count = select(func.count(Question.id)).where(
+        Question.question_set_id == QuestionSet.id
+    ).correlate(QuestionSet).scalar_subquery()
+
+    return select(QuestionSet, question_count.label('question_count')).where(
+        QuestionSet.user_id == user_id
+    ).order_by(QuestionSet.timestamp.desc(), QuestionSet.id.desc())
+
+
+def quiz_history_rows(user_id: int) -> Select:
+    '''
+    Rows of (WrongAnswerSet, question_set_name, wrong_count) for a user, newest first.
+    Attempts without wrong answers are left out, like before.
+    '''
+    wrong_counts = select(
+        WrongAnswer.wrong_answer_set_id, func.count(WrongAnswer.id).label('wrong_count')
+    ).where(
+        WrongAnswer.user_id == user_id
+    ).group_by(WrongAnswer.wrong_answer_set_id).subquery()
+
+    return select(
+        WrongAnswerSet, QuestionSet.name.label('question_set_name'), wrong_counts.c.wrong_count
+    ).join(
+        wrong_counts, wrong_counts.c.wrong_answer_set_id == WrongAnswerSet.id
+    ).outerjoin(
+        QuestionSet, QuestionSet.id == WrongAnswerSet.question_set_id
+    ).where(
+        WrongAnswerSet.user_id == user_id
+    ).order_by(WrongAnswerSet.timestamp.desc(), WrongAnswerSet.id.desc())
+
+
+def latest_wrong_answers(user_id: int, set_id: Optional[int] = None) -> Subquery:
+    '''
+    Subquery of (id, latest_rank) over a user's wrong answers, ranked per question newest first,
+    optionally only for the questions of one set. latest_rank == 1 is each question's latest wrong answer.
+    '''
+    latest_rank = func.row_number().over(
+        partition_by=WrongAnswer.question_id,
+        order_by=(WrongAnswer.timestamp.desc(), WrongAnswer.id.desc())
+    )
+    ranked = select(WrongAnswer.id, latest_rank.label('latest_rank')).where(
+        WrongAnswer.user_id == user_id
+    )
+    if set_id is not None:
+        ranked = ranked.join(Question, Question.id == WrongAnswer.question_id).where(
+            Question.question_set_id == set_id
+        )
+    return ranked.subquery()
+
+
+def question_stats_summary(user_id: int) -> Select:
+    '''One row of (questions seen, attempts, wrong answers, questions with a streak of 3+) for a user.'''
+    return select(
+        func.count(UserQuestionStats.id).label('question_count'),
+        func.coalesce(func.sum(UserQuestionStats.attempts), 0).label('attempts'),
+        func.coalesce(func.sum(UserQuestionStats.wrong_count), 0).label('wrong_count'),
+        func.count(UserQuestionStats.id).filter(UserQuestionStats.correct_streak >= MASTERED_STREAK).label('mastered_count'),
+    ).where(UserQuestionStats.user_id == user_id)
+
+
+def most_missed_questions(user_id: int) -> Select:
+    '''Rows of (UserQuestionStats, Question) of the questions a user got wrong, most wrong answers first.'''
+    return select(UserQuestionStats, Question).join(
+        Question, Question.id == UserQuestionStats.question_id
+    ).where(
+        UserQuestionStats.user_id == user_id, UserQuestionStats.wrong_count > 0
+    ).order_by(UserQuestionStats.wrong_count.desc(), UserQuestionStats.last_wrong.desc())
@@ -0,0 +1,135 @@
+'''
+Brings an existing database up to the current models without losing data.
+
+`db.create_all()` only creates missing tables; it never touches tables that already
+exist, so databases created by older versions of the app miss the newer columns and indexes.
+
+Usage (from the GUI folder, honours DATABASE_URL):
+    python migrations.py
+'''
+from typing import List, Set
+from sqlalchemy import bindparam, func, insert, inspect, literal, select, text, update
+from sqlalchemy.engine import Engine
+from models import db, Question, UserQuestionStats, WrongAnswer
+from dedup import question_fingerprint
+from search import FTS_TABLE, create_search_index
+
+# Rows fingerprinted per statement when backfilling old questions
+BACKFILL_BATCH_SIZE: int = 5000
+
+
+def add_missing_columns(engine: Engine) -> List[str]:
+    '''
+    ALTER TABLE ... ADD COLUMN for every model column the database does not have yet.
+    New columns must be nullable or have a server default, like `ADD COLUMN` requires.
+    '''
+    inspector = inspect(engine)
+    added: List[str] = []
+
+    for table in db.metadata.sorted_tables:
+        existing: Set[str] = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            ddl: str = f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(engine.dialect)}'
+            if column.server_default is not None:
+                ddl += f' NOT NULL DEFAULT {column.server_default.arg}' if not column.nullable else f' DEFAULT {column.server_default.arg}'
+            with engine.begin() as conn:
+                conn.execute(text(ddl))
+            added.append(f'{table.name}.{column.name}')
+    return added
+
+
+def backfill_fingerprints(engine: Engine) -> int:
+    '''Fingerprint the questions stored before the fingerprint column existed, in batches.'''
+    fingerprinted: int = 0
+    columns = (Question.question_text, Question.option_a, Question.option_b, Question.option_c, Question.option_d)
+    statement = update(Question.__table__).where(
+        Question.__table__.c.id == bindparam('question_id')
+    ).values(fingerprint=bindparam('question_fingerprint'))
+
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                select(Question.id, *columns).where(Question.fingerprint.is_(None)).limit(BACKFILL_BATCH_SIZE)
+            ).all()
+            if not rows:
+                return fingerprinted
+            conn.execute(statement, [
+                {'question_id': row[0], 'question_fingerprint': question_fingerprint(*row[1:])} for row in rows
+            ])
+        fingerprinted += len(rows)
+
+
+def backfill_question_stats(engine: Engine) -> int:
+    '''
+    Fill UserQuestionStats from the WrongAnswer history with one INSERT ... SELECT.
+    Only wrong answers were stored before, so each one counts as an attempt and streaks start at 0.
+    Meant for the run that creates the table; later answers are counted by the quiz itself.
+    '''
+    history = select(
+        WrongAnswer.user_id, WrongAnswer.question_id,
+        func.count(WrongAnswer.id), func.count(WrongAnswer.id), literal(0),
+        func.max(WrongAnswer.timestamp), func.max(WrongAnswer.timestamp)
+    ).join(
+        # Wrong answers of deleted questions are left out
+        Question, Question.id == WrongAnswer.question_id
+    ).group_by(WrongAnswer.user_id, WrongAnswer.question_id)
+
+    with engine.begin() as conn:
+        result = conn.execute(insert(UserQuestionStats).from_select(
+            ['user_id', 'question_id', 'attempts', 'wrong_count', 'correct_streak', 'last_seen', 'last_wrong'], history
+        ))
+    return result.rowcount
+
+
+def create_missing_indexes(engine: Engine) -> List[str]:
+    '''Create every index declared on the models that the database does not have yet.'''
+    inspector = inspect(engine)
+    created: List[str] = []
+
+    for table in db.metadata.sorted_tables:
+        existing: Set[str] = {str(index['name']) for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(engine)
+                created.append(str(index.name))
+
+    if created and engine.dialect.name == 'sqlite':
+        # Refresh the planner statistics so the new indexes get picked up.
+        with engine.begin() as conn:
+            conn.execute(text('ANALYZE'))
+    return created
+
+
+def upgrade_database(engine: Engine) -> List[str]:
+    '''
+    Create missing tables, then missing columns and indexes on existing tables,
+    fill the new columns of old rows, build the search index (see search.py) and,
+    when the question statistics table is new, fill it from the wrong-answer history.
+    Returns:
+        Names of the tables, columns and indexes that had to be created.
+    '''
+    stats_table: str = UserQuestionStats.__tablename__
+    backfill_stats: bool = not inspect(engine).has_table(stats_table)
+    db.metadata.create_all(engine)
+    changes: List[str] = add_missing_columns(engine) + create_missing_indexes(engine)
+    backfill_fingerprints(engine)
+    if backfill_stats:
+        backfill_question_stats(engine)
+        changes.append(stats_table)
+    if create_search_index(engine):
+        changes.append(FTS_TABLE)
+    return changes
+
+
+if __name__ == '__main__':
+    from app import app
+
+    with app.app_context():
+        changes: List[str] = upgrade_database(db.engine)
+
+    if changes:
+        print(f"Created {len(changes)} tables/columns/indexes: {', '.join(changes)}")
+    else:
+        print("Database is up to date.")
@@ -2,6 +2,7 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from typing import List, Optional
 from datetime import datetime
+from dedup import question_fingerprint
 
 db = SQLAlchemy()
 
@@ -20,6 +21,11 @@ class User(UserMixin, db.Model):
         self.password = password
 
 class QuestionSet(db.Model):
+    __table_args__ = (
+        # "My question bank" and the index page list a user's sets
+        db.Index('ix_question_set_user_timestamp', 'user_id', 'timestamp'),
+    )
+
     id: db.Mapped[int] = db.Column(db.Integer, primary_key=True)
     name: db.Mapped[str] = db.Column(db.String(255), nullable=False)
     timestamp: db.Mapped[datetime] = db.Column(db.DateTime, server_default=db.func.now())
@@ -39,6 +45,15 @@ class QuestionSet(db.Model):
         self.user_id = user_id
 
 class Question(db.Model):
+    __table_args__ = (
+        # Sampling and listing a user's questions, optionally within one set
+        db.Index('ix_question_user_set', 'user_id', 'question_set_id'),
+        # Set detail pages and cascades that only know the set
+        db.Index('ix_question_set_id', 'question_set_id'),
+        # Finding a user's copies of a question by fingerprint (see dedup.py); imports only dedup within the upload
+        db.Index('ix_question_user_fingerprint', 'user_id', 'fingerprint'),
+    )
+
     id: db.Mapped[int] = db.Column(db.Integer, primary_key=True)
     question_text: db.Mapped[str] = db.Column(db.String(1000), nullable=False)
     option_a: db.Mapped[str] = db.Column(db.String(500), nullable=False)
@@ -47,6 +62,8 @@ class Question(db.Model):
     option_d: db.Mapped[str] = db.Column(db.String(500), nullable=False)
     correct_answer: db.Mapped[str] = db.Column(db.String(10), nullable=False)
     is_multiple_choice: db.Mapped[bool] = db.Column(db.Boolean, default=False, nullable=False)
+    # Hash of the normalized question text (see dedup.question_fingerprint), NULL until backfilled on old rows
+    fingerprint: db.Mapped[Optional[str]] = db.Column(db.String(32), nullable=True)
     
     user_id: db.Mapped[int] = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     
@@ -55,6 +72,8 @@ class Question(db.Model):
 
     # ADDED: Cascade delete for wrong answers when a question is deleted
     wrong_answers: db.Mapped[List["WrongAnswer"]] = db.relationship('WrongAnswer', backref='question', lazy=True, cascade="all, delete-orphan")
+    # Per-user answer statistics go with the question
+    stats: db.Mapped[List["UserQuestionStats"]] = db.relationship('UserQuestionStats', backref='question', lazy=True, cascade="all, delete-orphan")
 
     def __init__(self, question_text: str, option_a: str, option_b: str, option_c: str, option_d: str, correct_answer: str, is_multiple_choice: bool, user_id: int, question_set_id: int):
         self.question_text = question_text
@@ -64,10 +83,16 @@ class Question(db.Model):
         self.option_d = option_d
         self.correct_answer = correct_answer
         self.is_multiple_choice = is_multiple_choice
+        self.fingerprint = question_fingerprint(question_text, option_a, option_b, option_c, option_d)
         self.user_id = user_id
         self.question_set_id = question_set_id
 
 class WrongAnswerSet(db.Model):
+    __table_args__ = (
+        # Quiz history, newest first
+        db.Index('ix_wrong_answer_set_user_timestamp', 'user_id', 'timestamp'),
+    )
+
     id: db.Mapped[int] = db.Column(db.Integer, primary_key=True)
     timestamp: db.Mapped[datetime] = db.Column(db.DateTime, server_default=db.func.now())
     user_id: db.Mapped[int] = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -84,6 +109,14 @@ class WrongAnswerSet(db.Model):
         self.question_set_id = question_set_id
 
 class WrongAnswer(db.Model):
+    __table_args__ = (
+        db.Index('ix_wrong_answer_set_id', 'wrong_answer_set_id'),
+        # Latest wrong answer per question of a user
+        db.Index('ix_wrong_answer_user_question_timestamp', 'user_id', 'question_id', 'timestamp'),
+        # Cascades from Question
+        db.Index('ix_wrong_answer_question_id', 'question_id'),
+    )
+
     id: db.Mapped[int] = db.Column(db.Integer, primary_key=True)
     question_id: db.Mapped[int] = db.Column(db.Integer, db.ForeignKey('question.id'), nullable=False)
     selected_answer: db.Mapped[str] = db.Column(db.String(10), nullable=False)
@@ -95,4 +128,98 @@ class WrongAnswer(db.Model):
         self.question_id = question_id
         self.selected_answer = selected_answer
         self.user_id = user_id
-        self.wrong_answer_set_id = wrong_answer_set_id
\ No newline at end of file
+        self.wrong_answer_set_id = wrong_answer_set_id
+
+class ImportJob(db.Model):
+    __table_args__ = (
+        db.Index('ix_import_job_user_id', 'user_id'),
+    )
+
+    id: db.Mapped[int] = db.Column(db.Integer, primary_key=True)
+    user_id: db.Mapped[int] = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    file_name: db.Mapped[str] = db.Column(db.String(255), nullable=False)
+    # queued -> running -> finished / failed
+    status: db.Mapped[str] = db.Column(db.String(20), nullable=False, default='queued')
+    rows_parsed: db.Mapped[int] = db.Column(db.Integer, nullable=False, default=0)
+    rows_inserted: db.Mapped[int] = db.Column(db.Integer, nullable=False, default=0)
+    error_count: db.Mapped[int] = db.Column(db.Integer, nullable=False, default=0)
+    # Rows skipped because the user already had the question
+    duplicate_count: db.Mapped[int] = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    error_message: db.Mapped[Optional[str]] = db.Column(db.String(1000), nullable=True)
+    timestamp: db.Mapped[datetime] = db.Column(db.DateTime, server_default=db.func.now())
+    # Last status or progress change; jobs that stop changing are failed, see import_jobs.fail_stale_jobs
+    updated_at: db.Mapped[Optional[datetime]] = db.Column(db.DateTime, nullable=True)
+
+    # The set being filled while the job runs; the question set is removed again (and this cleared) if the job fails.
+    question_set_id: db.Mapped[Optional[int]] = db.Column(db.Integer, db.ForeignKey('question_set.id', ondelete='SET NULL'), nullable=True)
+
+    def __init__(self, user_id: int, file_name: str):
+        self.user_id = user_id
+        self.file_name = file_name
+        self.status = 'queued'
+        self.rows_parsed = 0
+        self.rows_inserted = 0
+        self.error_count = 0
+        self.duplicate_count = 0
+
+
+class QuizAttempt(db.Model):
+    __table_args__ = (
+        db.Index('ix_quiz_attempt_user_id', 'user_id'),
+    )
+
+    id: db.Mapped[int] = db.Column(db.Integer, primary_key=True)
+    user_id: db.Mapped[int] = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    question_set_id: db.Mapped[Optional[int]] = db.Column(db.Integer, db.ForeignKey('question_set.id', ondelete='SET NULL'), nullable=True)
+    # Created on the first flush that contains a wrong answer
+    wrong_answer_set_id: db.Mapped[Optional[int]] = db.Column(db.Integer, db.ForeignKey('wrong_answer_set.id', ondelete='SET NULL'), nullable=True)
+    # JSON encoded list of the shuffled question ids, written once when the quiz starts
+    question_ids: db.Mapped[str] = db.Column(db.Text, nullable=False)
+    current_index: db.Mapped[int] = db.Column(db.Integer, nullable=False, default=0)
+    # JSON encoded answers (right and wrong) not yet flushed to WrongAnswer
+    pending_answers: db.Mapped[str] = db.Column(db.Text, nullable=False, default='[]')
+    wrong_count: db.Mapped[int] = db.Column(db.Integer, nullable=False, default=0)
+    timestamp: db.Mapped[datetime] = db.Column(db.DateTime, server_default=db.func.now())
+    # Time of the latest answer (NULL until the first one), idle attempts are swept after a while
+    last_active: db.Mapped[Optional[datetime]] = db.Column(db.DateTime, nullable=True)
+
+    def __init__(self, user_id: int, question_ids: str, question_set_id: Optional[int] = None):
+        self.user_id = user_id
+        self.question_ids = question_ids
+        self.question_set_id = question_set_id
+        self.current_index = 0
+        self.pending_answers = '[]'
+        self.wrong_count = 0
+
+
+class UserQuestionStats(db.Model):
+    '''
+    Running answer statistics of one user on one question, right answers included
+    (WrongAnswer only keeps the wrong ones). Updated with every flush of a quiz's answers,
+    see quiz_store.update_question_stats.
+    '''
+    __table_args__ = (
+        # One row per (user, question), the target of the upsert
+        db.Index('ux_user_question_stats_user_question', 'user_id', 'question_id', unique=True),
+        # Most missed questions of a user
+        db.Index('ix_user_question_stats_user_wrong_count', 'user_id', 'wrong_count'),
+        db.Index('ix_user_question_stats_question_id', 'question_id'),
+    )
+
+    id: db.Mapped[int] = db.Column(db.Integer, primary_key=True)
+    user_id: db.Mapped[int] = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    question_id: db.Mapped[int] = db.Column(db.Integer, db.ForeignKey('question.id'), nullable=False)
+    attempts: db.Mapped[int] = db.Column(db.Integer, nullable=False, default=0)
+    wrong_count: db.Mapped[int] = db.Column(db.Integer, nullable=False, default=0)
+    # Right answers in a row, up to the latest answer
+    correct_streak: db.Mapped[int] = db.Column(db.Integer, nullable=False, default=0)
+    last_seen: db.Mapped[datetime] = db.Column(db.DateTime, nullable=False)
+    last_wrong: db.Mapped[Optional[datetime]] = db.Column(db.DateTime, nullable=True)
+
+    def __init__(self, user_id: int, question_id: int, last_seen: datetime):
+        self.user_id = user_id
+        self.question_id = question_id
+        self.attempts = 0
+        self.wrong_count = 0
+        self.correct_streak = 0
+        self.last_seen = last_seen
@@ -0,0 +1,68 @@
+from typing import Any, List, Optional
+from sqlalchemy import Select, func, select
+from models import db
+
+DEFAULT_PER_PAGE: int = 50
+
+
+class Page:
+    '''
+    One page of rows from a select that returns tuples, such as (Question, WrongAnswer)
+    or (QuestionSet, count). Mirrors the attributes of Flask-SQLAlchemy's Pagination so
+    templates can treat both the same way.
+    '''
+
+    def __init__(self, items: List[Any], page: int, per_page: int, total: int, total_capped: bool = False):
+        self.items = items
+        self.page = page
+        self.per_page = per_page
+        self.total = total
+        # More rows than `total` exist, they were not counted (see `paginate_rows(max_total=...)`)
+        self.total_capped = total_capped
+
+    @property
+    def pages(self) -> int:
+        return max(1, -(-self.total // self.per_page))
+
+    @property
+    def has_prev(self) -> bool:
+        return self.page > 1
+
+    @property
+    def has_next(self) -> bool:
+        return self.page < self.pages
+
+    @property
+    def prev_num(self) -> int:
+        return self.page - 1
+
+    @property
+    def next_num(self) -> int:
+        return self.page + 1
+
+    @property
+    def first_index(self) -> int:
+        '''1-based position of the first item of this page, for numbering rows.'''
+        return (self.page - 1) * self.per_page + 1
+
+
+def paginate_rows(stmt: Select, page: int, per_page: int = DEFAULT_PER_PAGE, max_total: Optional[int] = None) -> Page:
+    '''
+    Run a COUNT over `stmt` and fetch only the rows of the requested page.
+    Args:
+        max_total: Count at most this many rows past the start of the page (`LIMIT` inside the COUNT),
+                   for queries whose full count costs more than the page itself, such as searches.
+    '''
+    page = max(page, 1)
+    offset: int = (page - 1) * per_page
+    if max_total is None:
+        counted: Select = stmt.order_by(None)
+    else:
+        # Keeps the ORDER BY, so the count follows the same (cheap) scan as the page and stops early
+        counted = stmt.limit(offset + max_total + 1)
+    total: int = db.session.scalar(select(func.count()).select_from(counted.subquery())) or 0
+    total_capped: bool = max_total is not None and total > offset + max_total
+    if total_capped:
+        total = offset + max_total
+    items: List[Any] = list(db.session.execute(stmt.limit(per_page).offset(offset)).all())
+    return Page(items, page, per_page, total, total_capped)
@@ -0,0 +1,69 @@
+'''
+Counts the SQL statements a block of code (or a request) runs.
+
+    with assert_max_queries(db.engine, 4):
+        client.get('/quiz_history')
+
+Set app.config['LOG_QUERY_COUNTS'] = True (or QUERY_AUDIT=1 in the environment)
+to log the statement count of every request.
+'''
+from contextlib import contextmanager
+from typing import Any, Iterator, List
+from flask import Flask, g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+import os
+
+
+class QueryCounter:
+    def __init__(self) -> None:
+        self.statements: List[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def _record(self, conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool) -> None:
+        self.statements.append(statement)
+
+
+@contextmanager
+def count_queries(engine: Engine) -> Iterator[QueryCounter]:
+    '''Record every statement sent through `engine` while the block runs.'''
+    counter = QueryCounter()
+    event.listen(engine, 'before_cursor_execute', counter._record)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, 'before_cursor_execute', counter._record)
+
+
+@contextmanager
+def assert_max_queries(engine: Engine, limit: int) -> Iterator[QueryCounter]:
+    '''Fail with the offending statements when the block runs more than `limit` queries.'''
+    with count_queries(engine) as counter:
+        yield counter
+    if counter.count > limit:
+        executed: str = '\n'.join(counter.statements)
+        raise AssertionError(f'{counter.count} queries executed, expected at most {limit}:\n{executed}')
+
+
+def install_request_query_log(app: Flask, engine: Engine) -> None:
+    '''Log the number of statements of each request (only when enabled, it is meant for development).'''
+    if not (app.config.get('LOG_QUERY_COUNTS') or os.environ.get('QUERY_AUDIT') == '1'):
+        return
+
+    def record(conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool) -> None:
+        if has_app_context() and 'query_count' in g:
+            g.query_count += 1
+
+    event.listen(engine, 'before_cursor_execute', record)
+
+    @app.before_request
+    def start_counting() -> None:
+        g.query_count = 0
+
+    @app.after_request
+    def log_query_count(response: Any) -> Any:
+        app.logger.info('%s %s ran %d queries', request.method, request.path, g.get('query_count', 0))
+        return response
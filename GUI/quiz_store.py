@@ -0,0 +1,328 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, NamedTuple, Optional, Set
+from flask import session
+from sqlalchemy import case, delete, func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from models import db, Question, QuizAttempt, UserQuestionStats, WrongAnswer, WrongAnswerSet
+import threading
+import json
+
+# The only quiz state kept in the cookie session.
+SESSION_KEY: str = 'quiz_attempt_id'
+
+# How many attempts keep their question batch in memory (least recently used ones are dropped).
+MAX_CACHED_ATTEMPTS: int = 256
+
+# Buffered answers are written to WrongAnswer once this many have piled up, and when the quiz ends.
+FLUSH_EVERY: int = 20
+
+# Attempts without an answer for this long are closed by `sweep_idle_attempts`, their answers kept.
+IDLE_ATTEMPT_TIMEOUT: timedelta = timedelta(hours=2)
+# Minimum time between two sweeps of one process
+SWEEP_INTERVAL: timedelta = timedelta(minutes=10)
+
+
+class QuestionSnapshot(NamedTuple):
+    '''Read-only copy of the `Question` columns a quiz needs to render and grade.'''
+    id: int
+    question_text: str
+    option_a: str
+    option_b: str
+    option_c: str
+    option_d: str
+    correct_answer: str
+    is_multiple_choice: bool
+
+
+class CachedAttempt(NamedTuple):
+    # The attempt row's JSON list as stored: attempt ids are reused once a finished attempt's
+    # row is deleted, so an entry only counts as a hit while this still matches the row.
+    raw_question_ids: str
+    question_ids: List[int]
+    questions: Dict[int, QuestionSnapshot]
+
+
+_attempt_cache: "OrderedDict[int, CachedAttempt]" = OrderedDict()
+_cache_lock: threading.Lock = threading.Lock()
+
+_last_sweep: Optional[datetime] = None
+
+
+def create_attempt(user_id: int, question_ids: List[int], question_set_id: Optional[int] = None) -> QuizAttempt:
+    '''
+    Store a new quiz attempt server-side and remember its id in the session.
+    The question list is written once here and never re-encoded afterwards.
+    An unfinished previous attempt of this session is closed first, and the answers buffered by the
+    user's attempts in other sessions are written out, so none of them wait on a quiz that may never end.
+    '''
+    previous: Optional[QuizAttempt] = get_current_attempt(user_id)
+    if previous:
+        finish_attempt(previous)
+    flush_user_attempts(user_id)
+
+    attempt = QuizAttempt(
+        user_id=user_id,
+        question_ids=json.dumps(question_ids),
+        question_set_id=question_set_id
+    )
+    db.session.add(attempt)
+    db.session.commit()
+
+    session[SESSION_KEY] = attempt.id
+    _cache_attempt(attempt.id, attempt.question_ids)
+    return attempt
+
+
+def get_current_attempt(user_id: int) -> Optional[QuizAttempt]:
+    '''Return the attempt referenced by the session, if it still exists and belongs to `user_id`.'''
+    attempt_id: Optional[int] = session.get(SESSION_KEY)
+    if not attempt_id:
+        return None
+
+    attempt: Optional[QuizAttempt] = db.session.get(QuizAttempt, attempt_id)
+    if not attempt or attempt.user_id != user_id:
+        session.pop(SESSION_KEY, None)
+        return None
+    return attempt
+
+
+def _load_questions(question_ids: List[int]) -> Dict[int, QuestionSnapshot]:
+    '''Fetch every question of an attempt with one query.'''
+    rows = db.session.execute(
+        select(
+            Question.id, Question.question_text,
+            Question.option_a, Question.option_b, Question.option_c, Question.option_d,
+            Question.correct_answer, Question.is_multiple_choice
+        ).where(Question.id.in_(question_ids))
+    )
+    return {row.id: QuestionSnapshot(*row) for row in rows}
+
+
+def _cache_attempt(attempt_id: int, raw_question_ids: str) -> CachedAttempt:
+    question_ids: List[int] = json.loads(raw_question_ids)
+    cached = CachedAttempt(raw_question_ids, question_ids, _load_questions(question_ids))
+    with _cache_lock:
+        _attempt_cache[attempt_id] = cached
+        _attempt_cache.move_to_end(attempt_id)
+        while len(_attempt_cache) > MAX_CACHED_ATTEMPTS:
+            _attempt_cache.popitem(last=False)
+    return cached
+
+
+def _cached_attempt(attempt: QuizAttempt) -> CachedAttempt:
+    '''
+    Return the attempt's question batch, reloading it in one query on a miss
+    (e.g. another worker process started the quiz, the entry was evicted, or it belongs to an
+    earlier attempt that had the same id and was finished in another process).
+    '''
+    with _cache_lock:
+        cached: Optional[CachedAttempt] = _attempt_cache.get(attempt.id)
+        if cached and cached.raw_question_ids == attempt.question_ids:
+            _attempt_cache.move_to_end(attempt.id)
+            return cached
+    return _cache_attempt(attempt.id, attempt.question_ids)
+
+
+def invalidate_attempt_cache() -> None:
+    '''
+    Forget every cached question batch, after questions were deleted: running attempts reload
+    theirs on the next request and no longer serve the deleted questions. Other worker processes
+    keep their cache, `flush_answers` drops answers to questions that are gone.
+    '''
+    with _cache_lock:
+        _attempt_cache.clear()
+
+
+def attempt_question_ids(attempt: QuizAttempt) -> List[int]:
+    return _cached_attempt(attempt).question_ids
+
+
+def get_attempt_question(attempt: QuizAttempt, question_id: int) -> Optional[QuestionSnapshot]:
+    '''Serve a question of the attempt from the cache. Questions outside the attempt return None.'''
+    return _cached_attempt(attempt).questions.get(question_id)
+
+
+def _utcnow() -> datetime:
+    # Same clock as the server_default=func.now() timestamps SQLite writes (naive UTC).
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def record_answer(attempt: QuizAttempt, question_id: int, selected_answer: str, is_correct: bool) -> int:
+    '''
+    Buffer one graded answer in the attempt row and move to the next question (no commit).
+    The buffer lives in the database, so answers survive a worker crash until they are flushed.
+    Returns:
+        The new current index.
+    '''
+    pending: List[List[Any]] = json.loads(attempt.pending_answers)
+
+    pending.append([question_id, selected_answer, is_correct, _utcnow().isoformat()])
+
+    # One UPDATE of the attempt row carries the index, the buffer and the wrong counter.
+    attempt.current_index += 1
+    attempt.pending_answers = json.dumps(pending)
+    attempt.last_active = _utcnow()
+    if not is_correct:
+        attempt.wrong_count += 1
+
+    if len(pending) >= FLUSH_EVERY:
+        flush_answers(attempt)
+    return attempt.current_index
+
+
+def flush_answers(attempt: QuizAttempt) -> None:
+    '''
+    Write the buffered wrong answers with one multi-row INSERT, add every buffered answer to
+    the question statistics and clear the buffer (no commit).
+    The attempt's WrongAnswerSet is only created once there is something to put in it.
+    Answers to questions deleted since (their set was deleted during the quiz) are dropped,
+    SQLite does not enforce the foreign keys that would reject them.
+    '''
+    pending: List[List[Any]] = json.loads(attempt.pending_answers)
+    if not pending:
+        return
+    existing: Set[int] = set(db.session.scalars(
+        select(Question.id).where(Question.id.in_({answer[0] for answer in pending}))
+    ))
+    pending = [answer for answer in pending if answer[0] in existing]
+
+    wrong: List[List[Any]] = [answer for answer in pending if not answer[2]]
+    if wrong:
+        if not attempt.wrong_answer_set_id:
+            wrong_answer_set = WrongAnswerSet(user_id=attempt.user_id, question_set_id=attempt.question_set_id)
+            wrong_answer_set.timestamp = attempt.timestamp
+            db.session.add(wrong_answer_set)
+            db.session.flush()
+            attempt.wrong_answer_set_id = wrong_answer_set.id
+
+        db.session.execute(insert(WrongAnswer), [
+            {
+                'question_id': question_id,
+                'selected_answer': selected_answer,
+                'user_id': attempt.user_id,
+                'wrong_answer_set_id': attempt.wrong_answer_set_id,
+                'timestamp': datetime.fromisoformat(answered_at),
+            }
+            for question_id, selected_answer, _, answered_at in wrong
+        ])
+
+    update_question_stats(attempt.user_id, pending)
+    attempt.pending_answers = '[]'
+    db.session.flush()
+
+
+def _stats_rows(user_id: int, answers: List[List[Any]]) -> List[Dict[str, Any]]:
+    '''Fold buffered answers, oldest first, into one stats delta per question.'''
+    rows: Dict[int, Dict[str, Any]] = {}
+    for question_id, _, is_correct, answered_at in answers:
+        answered: datetime = datetime.fromisoformat(answered_at)
+        row: Dict[str, Any] = rows.setdefault(question_id, {
+            'user_id': user_id, 'question_id': question_id, 'attempts': 0, 'wrong_count': 0,
+            'correct_streak': 0, 'last_seen': answered, 'last_wrong': None,
+        })
+        row['attempts'] += 1
+        row['last_seen'] = answered
+        if is_correct:
+            row['correct_streak'] += 1
+        else:
+            row['wrong_count'] += 1
+            row['correct_streak'] = 0
+            row['last_wrong'] = answered
+    return list(rows.values())
+
+
+def update_question_stats(user_id: int, answers: List[List[Any]]) -> None:
+    '''
+    Add a batch of buffered answers to the user's UserQuestionStats rows with one
+    INSERT ... ON CONFLICT DO UPDATE (no commit).
+    '''
+    rows: List[Dict[str, Any]] = _stats_rows(user_id, answers)
+    if not rows:
+        return
+
+    dialect = {'sqlite': sqlite, 'postgresql': postgresql}.get(db.engine.dialect.name)
+    if dialect is None:
+        # No portable upsert: read the existing rows and merge them in Python
+        existing: Dict[int, UserQuestionStats] = {stats.question_id: stats for stats in db.session.scalars(
+            select(UserQuestionStats).where(
+                UserQuestionStats.user_id == user_id,
+                UserQuestionStats.question_id.in_([row['question_id'] for row in rows])
+            )
+        )}
+        for row in rows:
+            stats: Optional[UserQuestionStats] = existing.get(row['question_id'])
+            if stats is None:
+                stats = UserQuestionStats(user_id, row['question_id'], row['last_seen'])
+                db.session.add(stats)
+            stats.correct_streak = row['correct_streak'] if row['wrong_count'] else stats.correct_streak + row['correct_streak']
+            stats.attempts += row['attempts']
+            stats.wrong_count += row['wrong_count']
+            stats.last_seen = row['last_seen']
+            stats.last_wrong = row['last_wrong'] or stats.last_wrong
+        return
+
+    statement = dialect.insert(UserQuestionStats)
+    db.session.execute(statement.on_conflict_do_update(
+        index_elements=[UserQuestionStats.user_id, UserQuestionStats.question_id],
+        set_={
+            'attempts': UserQuestionStats.attempts + statement.excluded.attempts,
+            'wrong_count': UserQuestionStats.wrong_count + statement.excluded.wrong_count,
+            # A wrong answer in the batch restarts the streak
+            'correct_streak': case(
+                (statement.excluded.wrong_count > 0, statement.excluded.correct_streak),
+                else_=UserQuestionStats.correct_streak + statement.excluded.correct_streak
+            ),
+            'last_seen': statement.excluded.last_seen,
+            'last_wrong': func.coalesce(statement.excluded.last_wrong, UserQuestionStats.last_wrong),
+        }
+    ), rows)
+
+
+def _close_attempt(attempt: QuizAttempt) -> None:
+    flush_answers(attempt)
+    db.session.execute(delete(QuizAttempt).where(QuizAttempt.id == attempt.id))
+    with _cache_lock:
+        _attempt_cache.pop(attempt.id, None)
+
+
+def finish_attempt(attempt: QuizAttempt) -> None:
+    '''Flush the remaining answers, then drop the attempt row and its session reference (no commit).'''
+    _close_attempt(attempt)
+    session.pop(SESSION_KEY, None)
+
+
+def flush_user_attempts(user_id: int) -> None:
+    '''
+    Write out the buffered answers of all unfinished attempts of a user (no commit), e.g. on login,
+    when the attempt may have been left behind in another browser or a lost session.
+    The attempts stay open; abandoned ones are removed by `sweep_idle_attempts`.
+    '''
+    for attempt in db.session.scalars(
+        select(QuizAttempt).where(QuizAttempt.user_id == user_id, QuizAttempt.pending_answers != '[]')
+    ):
+        flush_answers(attempt)
+
+
+def sweep_idle_attempts(force: bool = False) -> int:
+    '''
+    Close every attempt without an answer for `IDLE_ATTEMPT_TIMEOUT` (answers flushed, row deleted)
+    and commit. Runs at most once per `SWEEP_INTERVAL` per process unless `force` is set.
+    Returns:
+        The number of closed attempts.
+    '''
+    global _last_sweep
+    now: datetime = _utcnow()
+    if not force and _last_sweep is not None and now - _last_sweep < SWEEP_INTERVAL:
+        return 0
+    _last_sweep = now
+
+    idle: List[QuizAttempt] = list(db.session.scalars(
+        select(QuizAttempt).where(
+            func.coalesce(QuizAttempt.last_active, QuizAttempt.timestamp) < now - IDLE_ATTEMPT_TIMEOUT
+        )
+    ))
+    for attempt in idle:
+        _close_attempt(attempt)
+    db.session.commit()
+    return len(idle)
@@ -0,0 +1,109 @@
+from collections import OrderedDict
+from typing import List, NamedTuple, Optional, Tuple
+from sqlalchemy import func, select
+from models import db, Question
+import threading
+import random
+
+# How many (user, question set) id indexes are kept in memory.
+MAX_CACHED_INDEXES: int = 512
+
+
+class IdIndex(NamedTuple):
+    '''
+    All question ids of one (user, question set), single-choice ids first.
+    `ids[:multi_start]` are single-choice, `ids[multi_start:]` multiple-choice.
+    '''
+    signature: Tuple[int, int, int]
+    ids: List[int]
+    multi_start: int
+
+    @property
+    def single_count(self) -> int:
+        return self.multi_start
+
+    @property
+    def multi_count(self) -> int:
+        return len(self.ids) - self.multi_start
+
+
+_index_cache: "OrderedDict[Tuple[int, Optional[int]], IdIndex]" = OrderedDict()
+_cache_lock: threading.Lock = threading.Lock()
+
+
+def _filters(user_id: int, question_set_id: Optional[int]) -> list:
+    conditions = [Question.user_id == user_id]
+    if question_set_id is not None:
+        conditions.append(Question.question_set_id == question_set_id)
+    return conditions
+
+
+def _signature(user_id: int, question_set_id: Optional[int]) -> Tuple[int, int, int]:
+    '''
+    Cheap aggregate over the ids only. Any import or delete changes it, which also
+    keeps indexes cached by other worker processes from going stale.
+    '''
+    count, max_id, id_sum = db.session.execute(
+        select(func.count(Question.id), func.max(Question.id), func.sum(Question.id))
+        .where(*_filters(user_id, question_set_id))
+    ).one()
+    return (count, max_id or 0, id_sum or 0)
+
+
+def _build_index(user_id: int, question_set_id: Optional[int], signature: Tuple[int, int, int]) -> IdIndex:
+    rows = db.session.execute(
+        select(Question.id, Question.is_multiple_choice)
+        .where(*_filters(user_id, question_set_id))
+        .order_by(Question.is_multiple_choice, Question.id)
+    ).all()
+    multi_start: int = next((i for i, row in enumerate(rows) if row.is_multiple_choice), len(rows))
+    return IdIndex(signature, [row.id for row in rows], multi_start)
+
+
+def get_id_index(user_id: int, question_set_id: Optional[int] = None) -> IdIndex:
+    '''Return the id index of a question set (or of all the user's questions), rebuilding it when stale.'''
+    key: Tuple[int, Optional[int]] = (user_id, question_set_id)
+    signature: Tuple[int, int, int] = _signature(user_id, question_set_id)
+
+    with _cache_lock:
+        index: Optional[IdIndex] = _index_cache.get(key)
+        if index and index.signature == signature:
+            _index_cache.move_to_end(key)
+            return index
+
+    index = _build_index(user_id, question_set_id, signature)
+    with _cache_lock:
+        _index_cache[key] = index
+        _index_cache.move_to_end(key)
+        while len(_index_cache) > MAX_CACHED_INDEXES:
+            _index_cache.popitem(last=False)
+    return index
+
+
+def invalidate_id_index(user_id: int) -> None:
+    '''Forget every cached index of a user. Call it after importing or deleting questions.'''
+    with _cache_lock:
+        for key in [key for key in _index_cache if key[0] == user_id]:
+            del _index_cache[key]
+
+
+def sample_question_ids(index: IdIndex, num_questions: int, multi_ratio: Optional[float] = None) -> List[int]:
+    '''
+    Draw `num_questions` distinct ids from an index without touching any question rows.
+    Args:
+        multi_ratio: Optional share (0.0 - 1.0) of multiple-choice questions.
+                     When one kind runs short, the other kind fills the gap.
+    '''
+    num_questions = min(num_questions, len(index.ids))
+    if multi_ratio is None:
+        return random.sample(index.ids, num_questions)
+
+    num_multi: int = min(round(num_questions * multi_ratio), index.multi_count)
+    num_single: int = min(num_questions - num_multi, index.single_count)
+    num_multi = num_questions - num_single
+
+    # Sample positions from each stratum so no slice of the id list gets copied.
+    positions: List[int] = random.sample(range(index.multi_start), num_single) + \
+        random.sample(range(index.multi_start, len(index.ids)), num_multi)
+    random.shuffle(positions)
+    return [index.ids[i] for i in positions]
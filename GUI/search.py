@@ -0,0 +1,126 @@
+'''
+Full-text search over question stems and options.
+
+On SQLite the questions are indexed in an FTS5 table with the trigram tokenizer, which
+matches any substring of three or more characters, so Chinese text needs no word segmentation.
+The index is an external-content table over `question` (no second copy of the text) that
+triggers keep in sync on every insert, update and delete, bulk imports and cascades included.
+
+Search terms shorter than three characters cannot use a trigram index; they are matched with
+LIKE within the rows the other terms (or the user filter) already selected. Other databases,
+or SQLite builds without FTS5, fall back to LIKE for every term.
+'''
+from typing import List, Optional
+from sqlalchemy import ColumnElement, Select, and_, column, inspect, literal_column, or_, select, table, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+from models import db, Question, QuestionSet
+
+FTS_TABLE: str = 'question_fts'
+# Shortest term the trigram index can look up
+MIN_INDEXED_TERM: int = 3
+# Terms of a query that are used, the rest are ignored
+MAX_TERMS: int = 8
+# Results counted past the start of a page; beyond this the page shows "more than ..."
+MAX_COUNTED_RESULTS: int = 1000
+
+_SEARCH_COLUMNS: List[str] = ['question_text', 'option_a', 'option_b', 'option_c', 'option_d']
+
+_FTS_DDL: List[str] = [
+    f"""CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        {', '.join(_SEARCH_COLUMNS)}, content='question', content_rowid='id', tokenize='trigram'
+    )""",
+    f"""CREATE TRIGGER question_fts_insert AFTER INSERT ON question BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, {', '.join(_SEARCH_COLUMNS)})
+        VALUES (new.id, {', '.join('new.' + name for name in _SEARCH_COLUMNS)});
+    END""",
+    f"""CREATE TRIGGER question_fts_delete AFTER DELETE ON question BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {', '.join(_SEARCH_COLUMNS)})
+        VALUES ('delete', old.id, {', '.join('old.' + name for name in _SEARCH_COLUMNS)});
+    END""",
+    f"""CREATE TRIGGER question_fts_update AFTER UPDATE OF {', '.join(_SEARCH_COLUMNS)} ON question BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {', '.join(_SEARCH_COLUMNS)})
+        VALUES ('delete', old.id, {', '.join('old.' + name for name in _SEARCH_COLUMNS)});
+        INSERT INTO {FTS_TABLE}(rowid, {', '.join(_SEARCH_COLUMNS)})
+        VALUES (new.id, {', '.join('new.' + name for name in _SEARCH_COLUMNS)});
+    END""",
+]
+
+_fts = table(FTS_TABLE, column('rowid'))
+
+# Engine URL -> whether it has the index, looked up once per process
+_index_present: dict = {}
+
+
+def create_search_index(engine: Engine) -> bool:
+    '''
+    Create the FTS5 table and its triggers if they are missing, and index the existing questions.
+    Returns:
+        True if the index had to be created.
+    '''
+    if engine.dialect.name != 'sqlite' or inspect(engine).has_table(FTS_TABLE):
+        return False
+    try:
+        with engine.begin() as conn:
+            for ddl in _FTS_DDL:
+                conn.execute(text(ddl))
+            conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+    except OperationalError:
+        # SQLite without FTS5 or the trigram tokenizer (3.34+): search falls back to LIKE
+        return False
+    _index_present[str(engine.url)] = True
+    return True
+
+
+def has_search_index(engine: Engine) -> bool:
+    key: str = str(engine.url)
+    if key not in _index_present:
+        _index_present[key] = engine.dialect.name == 'sqlite' and inspect(engine).has_table(FTS_TABLE)
+    return _index_present[key]
+
+
+def search_terms(query: str) -> List[str]:
+    '''Whitespace separated terms of a query, duplicates removed, at most `MAX_TERMS`.'''
+    return list(dict.fromkeys(query.split()))[:MAX_TERMS]
+
+
+def _like_any_column(term: str) -> ColumnElement[bool]:
+    return or_(*(getattr(Question, name).contains(term, autoescape=True) for name in _SEARCH_COLUMNS))
+
+
+def search_questions(user_id: int, query: str, set_id: Optional[int] = None) -> Select:
+    '''
+    Rows of (Question, question_set_name) of a user whose stem or options contain every term
+    of `query`, in import order.
+
+    The rows are produced in that order without sorting, so a page (or a capped count, see
+    `pagination.paginate_rows`) stops after the rows it needs, however many questions match.
+    '''
+    terms: List[str] = search_terms(query)
+    indexed: List[str] = [term for term in terms if len(term) >= MIN_INDEXED_TERM] if has_search_index(db.engine) else []
+    others: List[str] = [term for term in terms if term not in indexed]
+
+    columns = (Question, QuestionSet.name.label('question_set_name'))
+    if indexed:
+        # Every term as an FTS5 string (quotes doubled), all of them must match. The index is the
+        # outer loop: FTS5 returns the matches by ascending rowid, each one looks up its question
+        # by primary key. (Started from `question`, SQLite runs the MATCH again for every row.)
+        match: str = ' '.join('"' + term.replace('"', '""') + '"' for term in indexed)
+        stmt = select(*columns).select_from(_fts).join(
+            Question, Question.id == _fts.c.rowid
+        ).where(
+            literal_column(FTS_TABLE).op('MATCH')(match), Question.user_id == user_id
+        ).order_by(_fts.c.rowid)
+    elif set_id is None:
+        # Walk the table by primary key: the user index is not in id order and would need a full sort.
+        # (`+ 0` keeps SQLite from using it.)
+        stmt = select(*columns).where(Question.user_id + 0 == user_id).order_by(Question.id)
+    else:
+        stmt = select(*columns).where(Question.user_id == user_id).order_by(Question.id)
+
+    stmt = stmt.join(QuestionSet, QuestionSet.id == Question.question_set_id)
+    if set_id is not None:
+        stmt = stmt.where(Question.question_set_id == set_id)
+    if others:
+        stmt = stmt.where(and_(*(_like_any_column(term) for term in others)))
+    return stmt
@@ -0,0 +1,24 @@
+'''
+The listing pages run a constant number of queries, however much data a user has
+(see benchmarks/check_query_counts.py, which prints the same numbers).
+'''
+from pathlib import Path
+from typing import Dict, Tuple
+import sys
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'benchmarks'))
+import check_query_counts  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def counts(tmp_path_factory: pytest.TempPathFactory) -> Dict[str, Tuple[int, int]]:
+    return check_query_counts.collect_counts('sqlite:///' + str(tmp_path_factory.mktemp('db') / 'check.db'))
+
+
+@pytest.mark.parametrize('path', list(check_query_counts.MAX_QUERIES))
+def test_query_count_is_constant(counts: Dict[str, Tuple[int, int]], path: str) -> None:
+    small, large = counts[path]
+    assert small == large, f'{path}: {small} queries for a small account, {large} for a large one'
+    assert large <= check_query_counts.MAX_QUERIES[path], f'{path}: {large} queries'
@@ -1,32 +1,161 @@
 from pathlib import Path
-from typing import Optional, Union
+from typing import Any, Iterable, Iterator, Optional, Union
 import numpy as np
-import pandas as pd
-import re
+import threading
+import sys
 import os
 import json
 
+# Shared helpers live in OCR-Extracter/TOOLS
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'TOOLS'))
+from ocr_cache import OCRCache
+from question_structurer import chunk_lines, iter_questions, iter_questions_parallel
+
 # customer struct data
 QuestionData = list[Optional[Union[str, bool]]]
 
+# Options every extractor model is built with, unless overridden per instance.
+DEFAULT_OCR_OPTIONS: dict[str, Any] = {
+    'lang': 'ch',
+    'use_doc_orientation_classify': False,
+    'use_doc_unwarping': False,
+    'use_textline_orientation': False,
+    'enable_mkldnn': False,
+}
+
+# Loaded models shared by every extractor in the process, keyed by their options.
+_OCR_MODELS: dict[tuple, Any] = {}
+_OCR_MODELS_LOCK: threading.Lock = threading.Lock()
+
+IMAGE_SUFFIXES: tuple[str, ...] = ('.png', '.jpg', '.jpeg', '.bmp', '.pdf')
+
+
+def get_ocr_model(**options: Any) -> Any:
+    '''
+    Return the shared PaddleOCR model for these options, loading it on first use.
+    Args:
+        options: Overrides of `DEFAULT_OCR_OPTIONS` (e.g. lang='en').
+    '''
+    merged_options: dict[str, Any] = {**DEFAULT_OCR_OPTIONS, **options}
+    key: tuple = tuple(sorted(merged_options.items()))
+
+    with _OCR_MODELS_LOCK:
+        if key not in _OCR_MODELS:
+            # Recommended to import necessary dependency packages in this function 
+            # instead of at the beginning of the file 
+            # to avoid frequent loading of data packages during instance creation. 
+            # Also, avoid loading Paddle OCR when it is not needed, 
+            # and avoiding wasting resources.
+            import paddle
+            from paddleocr import PaddleOCR
+
+            # Check out your cuda compiled
+            if paddle.device.is_compiled_with_cuda():
+                print(f"Using GPU for acceleration... (lang: {merged_options['lang']})")
+            else:
+                print(f"Using CPU... (lang: {merged_options['lang']})")
+
+            _OCR_MODELS[key] = PaddleOCR(**merged_options)
+        return _OCR_MODELS[key]
+
 class PaddleOCR_Extracter:
     # PATH
     BASE_PATH: Path = Path.cwd().parent.parent # Workstation root directory
     
-    def __init__(self, fold_name: str, is_multiple: bool = False) -> None:
+    def __init__(self, fold_name: str, is_multiple: bool = False, ocr_options: Optional[dict[str, Any]] = None,
+                 use_cache: bool = True) -> None:
         '''
         Args:
             fold_name: The folder containing the all content you need to extract. Note: Must be located in the `input` folder within the project's root directory.
+            ocr_options: Overrides of `DEFAULT_OCR_OPTIONS`. Extractors with the same options share one loaded model.
+            use_cache: Reuse the OCR result of images that did not change since the last run (`output/ocr_cache.sqlite`).
         '''
         self.INPUT_FOLD_NAME: Path = self.BASE_PATH / 'input' / fold_name
         self.OUTPUT_FOLD_NAME: Path = self.BASE_PATH / 'output' / fold_name
         self.is_multiple = is_multiple
+        self.ocr_options: dict[str, Any] = ocr_options or {}
+        self.cache: Optional[OCRCache] = OCRCache(self.BASE_PATH / 'output' / 'ocr_cache.sqlite') if use_cache else None
         return None
 
+
+    @staticmethod
+    def warm_up(**options: Any) -> None:
+        '''
+        Load the shared OCR model ahead of time, e.g. when a long-running service starts,
+        so the first extraction does not pay the model initialisation.
+        '''
+        get_ocr_model(**options)
+
     
+    def _image_files(self) -> list[Path]:
+        '''The images of the input folder, in page order.'''
+        return sorted(p for p in self.INPUT_FOLD_NAME.iterdir() if p.suffix.lower() in IMAGE_SUFFIXES)
+
+
+    @staticmethod
+    def _page_json_name(image_index: int, page_index: int, image_file: Path) -> str:
+        '''
+        Artifact name of one OCRed page. The zero-padded image and page numbers come first,
+        so sorting the names gives the page order back (see `extract_all_contents`).
+        '''
+        return f'{image_index:05d}_{page_index:04d}_{image_file.stem}_res.json'
+
+
+    def _iter_image_pages(self, image_file: Path, image_index: int, config_key: str,
+                          json_path: Optional[Path] = None) -> Iterator[list[str]]:
+        '''
+        OCR one image (or multi-page file) page by page, or take its text from the OCR cache.
+        Args:
+            image_file: The image to recognise.
+            image_index: Position of the image in the folder, used in the artifact names.
+            config_key: `OCRCache.config_key` of this extractor's options.
+            json_path: When given, every page is also stored there as one JSON file.
+        Yields:
+            The recognised text lines (`rec_texts`) of each page, in page order.
+        '''
+        image_hash: str = ''
+        if self.cache is not None:
+            image_hash = self.cache.image_hash(image_file)
+            cached_texts: Optional[list[str]] = self.cache.get(image_hash, config_key)
+            if cached_texts is not None:
+                # Same content as a previous run: skip the OCR.
+                if json_path is not None:
+                    with open(json_path / self._page_json_name(image_index, 0, image_file), 'w', encoding='utf-8') as f:
+                        json.dump({'input_path': str(image_file), 'rec_texts': cached_texts}, f, ensure_ascii=False)
+                yield cached_texts
+                return
+
+        # Shared model, loaded once per process (see `get_ocr_model`)
+        ocr = get_ocr_model(**self.ocr_options)
+
+        # Run OCR identification lazily, one page at a time
+        image_texts: list[str] = []
+        page_count: int = 0
+        try:
+            for page_index, res in enumerate(ocr.predict_iter(input=str(image_file))):
+                rec_texts: list[str] = list(res['rec_texts'])
+                if json_path is not None:
+                    res.save_to_json(json_path / self._page_json_name(image_index, page_index, image_file))
+                # Release the page's arrays (image, boxes, scores) before the next page is predicted
+                del res
+                page_count += 1
+                if self.cache is not None:
+                    image_texts.extend(rec_texts)
+                yield rec_texts
+        except Exception as error:
+            print(error)
+            return
+
+        if not page_count:
+            print(f"No OCR result for image: {image_file}")
+        elif self.cache is not None:
+            self.cache.put(image_hash, config_key, image_texts)
+
+
     def _extract_image_to_json(self) -> None:
         '''
-        Using paddle to fetch one image content and stored it to a json file.
+        Using paddle to fetch the content of every image in the input folder and store it to json files,
+        one file per page. Images whose content hash is in the OCR cache are not OCRed again.
         '''
         
         img_path = self.INPUT_FOLD_NAME
@@ -35,50 +164,47 @@ class PaddleOCR_Extracter:
             print(f"{img_path} input fold is not a fold or exists")
             return
 
-        # Recommended to import necessary dependency packages in this function 
-        # instead of at the beginning of the file 
-        # to avoid frequent loading of data packages during instance creation. 
-        # Also, avoid loading Paddle OCR when it is not needed, 
-        # and avoiding wasting resources.
-        import paddle
-        from paddleocr import PaddleOCR
-        
-        
-        # Check out your cuda compiled
-        if paddle.device.is_compiled_with_cuda():
-            print(f"Using GPU for acceleration... (Images: {img_path})")
-        else:
-            print(f"Using CPU... (Images: {img_path})")
-
-        # Initialize OCR
-        ocr = PaddleOCR(
-            lang='ch',
-            use_doc_orientation_classify=False,
-            use_doc_unwarping=False,
-            use_textline_orientation=False,
-            enable_mkldnn=False 
-        )
+        os.makedirs(output_json_path, exist_ok=True)
+        config_key: str = OCRCache.config_key({**DEFAULT_OCR_OPTIONS, **self.ocr_options})
+        for image_index, image_file in enumerate(self._image_files()):
+            # Pages are written as they come and nothing is kept, memory stays flat for any folder size
+            for _ in self._iter_image_pages(image_file, image_index, config_key, output_json_path):
+                pass
 
-        # Run OCR identification
-        try:
-            result = ocr.predict(input=str(img_path))
-        except Exception as error:
-            print(error)
+
+    def iter_contents(self, save_artifacts: bool = False) -> Iterator[str]:
+        '''
+        Stream the text lines of every image in the input folder, page by page, straight from
+        the OCR result (or the OCR cache) without the JSON round-trip of `extract_all_contents`.
+        Args:
+            save_artifacts: Also write the JSON files and `extracted_total_contents.txt` like the file based flow does.
+        '''
+        if not Path.is_dir(self.INPUT_FOLD_NAME):
+            print(f"{self.INPUT_FOLD_NAME} input fold is not a fold or exists")
             return
-            
 
-        # Save the result using the .save_to_json() method
-        if result:
-            # Ensure output directory exists before saving
-            
-            os.makedirs(os.path.dirname(output_json_path), exist_ok=True)
-            for res in result:
-                # This will save the result of the first page (or only page)
-                # and overwrite if multiple pages are in the result.
-                # Assuming one page per image.
-                res.save_to_json(output_json_path)
-        else:
-            print(f"No OCR result for image: {img_path}")
+        output_json_path = self.OUTPUT_FOLD_NAME / 'json'
+        if save_artifacts:
+            os.makedirs(output_json_path, exist_ok=True)
+
+        config_key: str = OCRCache.config_key({**DEFAULT_OCR_OPTIONS, **self.ocr_options})
+        for image_index, image_file in enumerate(self._image_files()):
+            json_path: Optional[Path] = output_json_path if save_artifacts else None
+            for rec_texts in self._iter_image_pages(image_file, image_index, config_key, json_path):
+                if save_artifacts:
+                    debug_txt_file = self.OUTPUT_FOLD_NAME.parent / 'extracted_total_contents.txt'
+                    with open(debug_txt_file, '+a', encoding='utf-8') as f:
+                        f.write('\n=========================================================\n')
+                        f.write('\n'.join(rec_texts))
+
+                yield from rec_texts
+
+
+    def extract_questions(self, save_artifacts: bool = False, workers: int = 1) -> list[QuestionData]:
+        '''
+        In-memory pipeline: OCR -> `structure_questions`, with no intermediate files unless `save_artifacts` is set.
+        '''
+        return self.structure_questions(self.iter_contents(save_artifacts), save_log=save_artifacts, workers=workers)
 
     
     def extract_all_contents(self) -> list[str]:
@@ -115,173 +241,85 @@ class PaddleOCR_Extracter:
         
         
         JSON_FOLD = self.OUTPUT_FOLD_NAME / 'json'
-        total_contents = []
+        total_contents: list[str] = []
         
-        for item_file in sorted(JSON_FOLD.iterdir()):
+        # The page artifacts start with zero-padded image/page numbers, so name order is page order
+        for item_file in sorted(JSON_FOLD.iterdir(), key=lambda path: path.name):
             if item_file.suffix == '.json':
                 # print(f"file name: {item_file}") # Debugger file order
-                total_contents.append(extract_contents(item_file))
+                total_contents.extend(extract_contents(item_file))
             
-        return [item for sub_content in total_contents for item in sub_content]
+        return total_contents
         
     
-    def structure_questions(self, text_lines: list[str]) -> list[QuestionData]:
+    def structure_questions(self, text_lines: Iterable[str], save_log: bool = True, workers: int = 1) -> list[QuestionData]:
         """
-        Parses raw OCR text lines into a structured list of questions.
+        Parses raw OCR text lines into a structured list of questions, with the shared
+        single-pass structurer (see TOOLS/question_structurer.py).
         1. Combine multiple lines of questions into a single element of a list.
         2. Place options A, B, C, and D into separate list elements.
+        An option found twice starts an 'Errrrrrrrrrrrrrrrrrrrrrrrrrrrrror' question, to be fixed by hand.
+        `text_lines` may be a generator (see `iter_contents`); set `save_log` to False to skip `structed_contents.txt`.
+        With `workers` > 1 the text is cut into pages parsed on a process pool (same result, for large scan sets).
         
         Return:
             list[QuestionData]
             QuestionData content is ['题目', 'A', 'B', 'C', 'D', '多选'].
         """
-        # Helper function to clean and store an option in the correct index.
-        def store_option(question_list: QuestionData, option_text: str) -> None:
-            """Helper function to clean and store an option in the correct index."""
-            option_text = option_text.strip()
-            # print(f"option text: {option_text}") # debugger code
-            if not option_text:
-                return
-        
-            if option_text[0] in option_map:
-                option_char: str = option_text[0]
-                index: int = option_map[option_char]
-                clean_text: str = option_clean_re.sub('', option_text).strip()
-                
-                # Fixed a bug caused by incorrect question extraction.
-                if question_list[index] != None:
-                    raise ValueError("Question recognition error")
-
-                if 0 <= index < len(question_list):
-                    question_list[index] = clean_text
-                    
-                return
-
+        def new_question(stem_text: str) -> QuestionData:
+            return [
+                stem_text,  # 0: stem
+                None,       # 1: A
+                None,       # 2: B
+                None,       # 3: C
+                None,       # 4: D
+                self.is_multiple # Is tmultiple-choice?
+            ]
 
-        # --- 1. Regex Definitions ---
-        new_item_re = re.compile(r'^(?:\d+\.|[ABCD]\.)\s*')
-        question_stem_re = re.compile(r'^\d+\.\s*')
-        multi_option_find_re = re.compile(r'[ABCD]\.\s*')
-        multi_option_split_re = re.compile(r'(?=[ABCD]\.\s*)')
-        option_clean_re = re.compile(r'^[ABCD]\.\s*')
-
-    
-        # --- 2. Pass 1: Merge Continuation Text ---
-        merged_lines: list[str] = []
-        for line in text_lines:
-            # print(f"line: {line}") # debugger cod3
-            line = line.strip()
-            if not line:
-                continue
-        
-            if new_item_re.search(line) or not merged_lines:
-                merged_lines.append(line)
-            else:
-                merged_lines[-1] += "" + line
-            
-            
-        # --- 3. Pass 2: Structure into Question lists ---
-        all_questions: list[QuestionData] = []
-        option_map: dict[str, int] = {'A': 1, 'B': 2, 'C': 3, 'D': 4}
-        # --- Main Loop for Pass 2 ---
-        for line in merged_lines:
-            if question_stem_re.search(line):
-                # --- MODIFIED: Create QuestionData list ---
-                stem_text = question_stem_re.sub('', line).strip()
-                
-                # # Check for multiple choice keywords
-                # is_multi = "multiple selection" in stem_text.lower() or "多选" in stem_text
-
-                current_question_list: QuestionData = [
-                    stem_text,  # 0: stem
-                    None,       # 1: A
-                    None,       # 2: B
-                    None,       # 3: C
-                    None,       # 4: D
-                    self.is_multiple # Is tmultiple-choice?
-                ]
-                all_questions.append(current_question_list)
-        
-            elif all_questions: # Only process options if a question has been started
-                # This line is potentially an option
-                active_question_list: QuestionData = all_questions[-1]
-                
-                # check one line whether include two or more choice
-                option_matches = multi_option_find_re.findall(line)
-                try:
-                    if len(option_matches) >= 2:
-                        split_parts: list[str] = multi_option_split_re.split(line)
-                        for part in split_parts:
-                            store_option(active_question_list, part)
-                    elif len(option_matches) == 1 and line.startswith(tuple(option_map.keys())):
-                        store_option(active_question_list, line)
-                except ValueError as error:
-                    print(f"{error}, The error occurred in question {len(all_questions) + 1}.")
-                    current_question_list: QuestionData = [
-                        'Errrrrrrrrrrrrrrrrrrrrrrrrrrrrror',  # 0: stem
-                        None,       # 1: A
-                        None,       # 2: B
-                        None,       # 3: C
-                        None,       # 4: D
-                        self.is_multiple # Is tmultiple-choice?
-                    ]
-                    all_questions.append(current_question_list)
-                    store_option(all_questions[-1], line)
-               
+        if workers > 1:
+            all_questions: list[QuestionData] = list(
+                iter_questions_parallel(chunk_lines(text_lines), new_question, strict=True, workers=workers)
+            )
+        else:
+            all_questions = list(iter_questions(text_lines, new_question, strict=True))
                 
         # Log file
-        debug_txt_file = self.OUTPUT_FOLD_NAME.parent / 'structed_contents.txt'
-        with open(debug_txt_file, '+a', encoding='utf-8') as f:
-            for question in all_questions:
-                f.write("\n========================================")
-                for line in question:
-                    content_to_write = '\n' + str(line)
-                    f.write(content_to_write)
+        if save_log:
+            debug_txt_file = self.OUTPUT_FOLD_NAME.parent / 'structed_contents.txt'
+            with open(debug_txt_file, '+a', encoding='utf-8') as f:
+                f.write(''.join(
+                    "\n========================================" + ''.join('\n' + str(line) for line in question)
+                    for question in all_questions
+                ))
         
         return all_questions
 
 
 
 if __name__ == '__main__':
-    # Class
-    class Excel_Exector:
-        def __init__(self):
-            self.BASE_PATH: Path = Path.cwd()
-            return
-    
-    
-        def store_excel(self, question_lists: list[QuestionData]):
-            print(question_lists)
-            output_file = self.BASE_PATH.parent.parent / 'output' / 'data.xlsx'
-            output_file_csv = self.BASE_PATH.parent.parent / 'output' / 'data.csv'
-
-            # Create DataFrame (optional: add column names)
-            df = pd.DataFrame(question_lists, columns=['题目', 'A', 'B', 'C', 'D', '是否多选'])
-
-            # Write to Excel
-            df.to_excel(output_file, 
-                        sheet_name='Reshaped Data', 
-                        index=False) # Excludes the DataFrame's row index (0, 1, 2, 3)
-
-            df.to_csv(output_file_csv, 
-                        index=False,
-                        encoding='utf-8') # Excludes the DataFrame's row index (0, 1, 2, 3)
-            print(f"\nData successfully written to {output_file}")
-    
-    
+    from save_excel import Excel_Exector
+
     # Example
     print("start running...")
-    
-    all_questions = []
-    P = PaddleOCR_Extracter('chapter2/singal', False)
-    # P._extract_image_to_json()
-    structed_line_1 = P.structure_questions(P.extract_all_contents())
-    
-    P = PaddleOCR_Extracter('chapter2/multiple', True)
-    # P._extract_image_to_json()
-    structed_line_2 = P.structure_questions(P.extract_all_contents())
-    
-    
-    
-    E = Excel_Exector()
-    E.store_excel(structed_line_1 + structed_line_2)
\ No newline at end of file
+    OUTPUT_PATH: Path = Path.cwd().parent.parent / 'output'
+
+    # OCR -> questions in memory, pass save_artifacts=True to keep the JSON/txt files for debugging.
+    # Sections are extracted one at a time while the previous one is written out.
+    CHAPTERS: list[tuple[str, bool]] = [('chapter2/singal', False), ('chapter2/multiple', True)]
+    # One sheet (and one data_<folder>.csv) per folder instead of a single sheet and data.csv.
+    # The app only imports the first sheet of a workbook, so upload such files one sheet at a time.
+    SPLIT_SECTIONS: bool = os.environ.get('SPLIT_SECTIONS') == '1'
+    COLUMNS: list[str] = ['题目', 'A', 'B', 'C', 'D', '是否多选']
+    sections = ((fold_name, PaddleOCR_Extracter(fold_name, is_multiple).extract_questions()) for fold_name, is_multiple in CHAPTERS)
+
+    E = Excel_Exector(OUTPUT_PATH)
+    if SPLIT_SECTIONS:
+        counts: dict[str, int] = E.export_sections(
+            sections, xlsx_file=OUTPUT_PATH / 'data.xlsx', csv_file=OUTPUT_PATH / 'data.csv', columns=COLUMNS
+        )
+    else:
+        counts = E.export(
+            (question for _, questions in sections for question in questions),
+            xlsx_file=OUTPUT_PATH / 'data.xlsx', csv_file=OUTPUT_PATH / 'data.csv', columns=COLUMNS
+        )
+    print(f"\nData successfully written to {OUTPUT_PATH}: {counts}")
@@ -0,0 +1,152 @@
+'''
+Micro-benchmark of `question_structurer.iter_questions` against the previous two-pass
+`structure_questions` (kept below as the reference), on a synthetic 100k-line OCR transcript,
+and of `iter_questions_parallel` on 50-line pages. All must return the same questions.
+
+Usage (from the TOOLS folder):
+    python bench_structurer.py [line count] [worker count]
+'''
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from typing import Callable
+import multiprocessing
+import random
+import os
+import time
+import sys
+import io
+import re
+
+from question_structurer import ERROR_STEM, QuestionData, chunk_lines, iter_questions, iter_questions_parallel
+
+
+def legacy_structure_questions(text_lines: list[str], strict: bool) -> list[QuestionData]:
+    '''The structurer every extractor had before (two passes, regexes compiled per call).'''
+    def store_option(question_list: QuestionData, option_text: str) -> None:
+        option_text = option_text.strip()
+        if not option_text:
+            return
+        if option_text[0] in option_map:
+            index: int = option_map[option_text[0]]
+            clean_text: str = option_clean_re.sub('', option_text).strip()
+            if strict and question_list[index] != None:
+                raise ValueError("Question recognition error")
+            if 0 <= index < len(question_list):
+                question_list[index] = clean_text
+
+    new_item_re = re.compile(r'^(?:\d+\.|[ABCD]\.)\s*')
+    question_stem_re = re.compile(r'^\d+\.\s*')
+    multi_option_find_re = re.compile(r'[ABCD]\.\s*')
+    multi_option_split_re = re.compile(r'(?=[ABCD]\.\s*)')
+    option_clean_re = re.compile(r'^[ABCD]\.\s*')
+
+    merged_lines: list[str] = []
+    for line in text_lines:
+        line = line.strip()
+        if not line:
+            continue
+        if new_item_re.search(line) or not merged_lines:
+            merged_lines.append(line)
+        else:
+            merged_lines[-1] += "" + line
+
+    all_questions: list[QuestionData] = []
+    option_map: dict[str, int] = {'A': 1, 'B': 2, 'C': 3, 'D': 4}
+    for line in merged_lines:
+        if question_stem_re.search(line):
+            all_questions.append([question_stem_re.sub('', line).strip(), None, None, None, None, False])
+        elif all_questions:
+            active_question_list: QuestionData = all_questions[-1]
+            option_matches = multi_option_find_re.findall(line)
+            try:
+                if len(option_matches) >= 2:
+                    for part in multi_option_split_re.split(line):
+                        store_option(active_question_list, part)
+                elif len(option_matches) == 1 and line.startswith(tuple(option_map.keys())):
+                    store_option(active_question_list, line)
+            except ValueError as error:
+                print(f"{error}, The error occurred in question {len(all_questions) + 1}.")
+                all_questions.append([ERROR_STEM, None, None, None, None, False])
+                store_option(all_questions[-1], line)
+    return all_questions
+
+
+def synthetic_transcript(line_count: int, seed: int = 8) -> list[str]:
+    '''OCR-like lines: wrapped stems, inline and single options, noise and the odd repeated option.'''
+    rng = random.Random(seed)
+    lines: list[str] = ['第一章 练习题', '']
+    number: int = 1
+    while len(lines) < line_count:
+        lines.append(f'{number}. 下列关于数据库索引的说法，哪一项是正确的（ ）')
+        for _ in range(rng.randint(0, 2)):
+            lines.append('这一行是被 OCR 折断的题干续行 ' * rng.randint(1, 3))
+        layout: int = rng.randint(0, 3)
+        if layout == 0:
+            lines.append('A. 选项一 B. 选项二 C. 选项三 D. 选项四')
+        elif layout == 1:
+            lines += ['A. 选项一 B. 选项二', 'C. 选项三 D. 选项四']
+        else:
+            lines += ['A. 选项一', 'B. 选项二', '  ', 'C. 选项三', '续行', 'D. 选项四']
+        if rng.random() < 0.02:
+            lines.append('B. 重复识别的选项')
+        if rng.random() < 0.05:
+            lines.append(f'— {number} —')
+        if rng.random() < 0.05:
+            # Stem without options, followed directly by the next stem
+            number += 1
+            lines.append(f'{number}. 判断题：索引总能提高写入速度')
+        number += 1
+    return lines[:line_count]
+
+
+def timed(function: Callable[[], list[QuestionData]]) -> tuple[float, list[QuestionData], str]:
+    output = io.StringIO()
+    start: float = time.perf_counter()
+    with redirect_stdout(output):
+        result: list[QuestionData] = function()
+    return time.perf_counter() - start, result, output.getvalue()
+
+
+if __name__ == '__main__':
+    LINE_COUNT: int = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    WORKERS: int = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count() or 1
+    PAGE_LINES: int = 50
+    ROUNDS: int = 5
+    lines: list[str] = synthetic_transcript(LINE_COUNT)
+
+    def new_question(stem: str) -> QuestionData:
+        return [stem, None, None, None, None, False]
+
+    for strict in (False, True):
+        legacy_times: list[float] = []
+        shared_times: list[float] = []
+        for _ in range(ROUNDS):
+            legacy_seconds, legacy_result, legacy_log = timed(lambda: legacy_structure_questions(lines, strict))
+            shared_seconds, shared_result, shared_log = timed(lambda: list(iter_questions(lines, new_question, strict)))
+            assert shared_result == legacy_result and shared_log == legacy_log, 'structurer output differs'
+            legacy_times.append(legacy_seconds)
+            shared_times.append(shared_seconds)
+
+        print(f"strict={strict!s:<5} {LINE_COUNT} lines -> {len(shared_result)} questions | "
+              f"two-pass: {min(legacy_times) * 1000:.1f} ms | single-pass: {min(shared_times) * 1000:.1f} ms | "
+              f"speed-up x{min(legacy_times) / min(shared_times):.2f}")
+
+    # Parallel mode: the pool is started before timing, like a long-running batch would,
+    # with spawn like the pools of main.py and iter_questions_parallel
+    pages: list[list[str]] = list(chunk_lines(lines, PAGE_LINES))
+    if (os.cpu_count() or 1) < 2:
+        print(f"only {os.cpu_count()} CPU: the parallel numbers below cannot show any speed-up")
+    with ProcessPoolExecutor(max_workers=WORKERS, mp_context=multiprocessing.get_context('spawn')) as executor:
+        list(executor.map(abs, range(WORKERS)))
+        for strict in (False, True):
+            sequential_seconds, sequential_result, sequential_log = timed(lambda: list(iter_questions(lines, new_question, strict)))
+            parallel_times: list[float] = []
+            for _ in range(ROUNDS):
+                parallel_seconds, parallel_result, parallel_log = timed(
+                    lambda: list(iter_questions_parallel(pages, new_question, strict, executor=executor, chunksize=16))
+                )
+                assert parallel_result == sequential_result and parallel_log == sequential_log, 'parallel output differs'
+                parallel_times.append(parallel_seconds)
+
+            print(f"strict={strict!s:<5} {len(pages)} pages, {WORKERS} workers | single-pass: {sequential_seconds * 1000:.1f} ms | "
+                  f"parallel: {min(parallel_times) * 1000:.1f} ms | speed-up x{sequential_seconds / min(parallel_times):.2f}")
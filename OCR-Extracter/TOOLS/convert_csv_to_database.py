@@ -1,10 +1,46 @@
+'''
+Chapter databases and the loader that moves OCR output straight into the web app.
+
+Usage (from the TOOLS folder), one question set per file, named after the file:
+    python convert_csv_to_database.py <username> <chapter.csv | chapter.db> [...]
+
+CSV files are the ones written by save_excel.Excel_Exector ('题目', 'A'-'D', '多选' or
+'是否多选', '正确答案'), .db files the chapter databases written by main.py.
+Rows without a correct answer are skipped with a warning, the app cannot grade them.
+Rows are read and inserted in chunks (see GUI/importer.py), all files in one transaction,
+and questions repeated within a file are skipped. DATABASE_URL selects the target like for the app.
+'''
 import sqlite3
+import time
+import sys
 import os
-from typing import Optional, Union
+from typing import Iterator, Optional, Union
 from pathlib import Path
+import pandas as pd
+from question_writer import save_questions
+
+# The loader reuses the web app's models and importer
+sys.path.append(str(Path(__file__).resolve().parents[2] / 'GUI'))
 
 QuestionData = list[Optional[Union[str, bool]]]
 
+# Rows per chunk, read and inserted together
+DEFAULT_CHUNK_SIZE: int = 5000
+
+# CSV headers written by the OCR tools -> columns the GUI importer expects
+CSV_COLUMN_ALIASES: dict[str, str] = {'多选': '是否多选'}
+
+# Chapter database column -> GUI importer column
+DB_COLUMNS: dict[str, str] = {
+    'question_stem': '题目',
+    'option_a': 'A',
+    'option_b': 'B',
+    'option_c': 'C',
+    'option_d': 'D',
+    'correct_answer': '正确答案',
+    'is_multiple_choice': '是否多选',
+}
+
 def create_database(db_file: str | Path) -> None:
     """
     Creates an empty SQLite database with the 'questions' table.
@@ -12,13 +48,13 @@ def create_database(db_file: str | Path) -> None:
     """
     try:
         os.makedirs(os.path.dirname(db_file), exist_ok=True)
-        
+
         conn = sqlite3.connect(db_file)
         cursor = conn.cursor()
-        
+
         cursor.execute("DROP TABLE IF EXISTS questions")
-        
-        # This schema maps directly to the a list
+
+        # This schema maps directly to the 8-item list
         cursor.execute('''
         CREATE TABLE questions (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -28,51 +64,137 @@ def create_database(db_file: str | Path) -> None:
             option_c TEXT,
             option_d TEXT,
             is_multiple_choice BOOLEAN NOT NULL DEFAULT 0,
+            correct_answer TEXT,
+            explanation TEXT
         )
         ''')
-        
+
         conn.commit()
         conn.close()
         print(f"Successfully created/reset database: '{db_file}'")
     except sqlite3.Error as e:
         print(f"Database error: {e}")
-        
-        
+
+
 def save_questions_to_db(db_file: str | Path, questions: list[QuestionData]) -> None:
     """
-    Saves the list of structured (8-item) questions to the SQLite database.
+    Saves the list of structured (8-item) questions to the SQLite database,
+    in one transaction with batched inserts. Malformed rows are reported in one summary line.
     """
     try:
-        conn = sqlite3.connect(db_file)
-        cursor = conn.cursor()
-        
-        for q_list in questions:
-            # --- MODIFIED: q_list is now the 8-item list ---
-            if len(q_list) != 8:
-                print(f"Warning: Skipping malformed question data: {q_list}")
-                continue
-            
-            data_to_insert = tuple(q_list)
-            
-            # The 8 '?' placeholders match the 8 items in QuestionData
-            cursor.execute('''
-            INSERT INTO questions (
-                question_stem, option_a, option_b, option_c, option_d,
-                is_multiple_choice, correct_answer, explanation
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', data_to_insert)
-        
-        conn.commit()
-        conn.close()
-        print(f"Successfully saved {len(questions)} questions to '{db_file}'")
+        save_questions(db_file, questions)
     except sqlite3.Error as e:
         print(f"Database error while inserting: {e}")
 
 
+# --- Loading into the web app ---
+
+def iter_csv_frames(csv_file: str | Path, required_columns: list[str],
+                    chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    '''Read an exported CSV `chunk_size` rows at a time, as DataFrames with `required_columns`.'''
+    for chunk in pd.read_csv(csv_file, dtype=str, keep_default_na=False, encoding='utf-8-sig', chunksize=chunk_size):
+        chunk = chunk.rename(columns=CSV_COLUMN_ALIASES)
+        missing: list[str] = [column for column in required_columns if column not in chunk.columns]
+        if '题目' in missing:
+            raise ValueError(f"'{csv_file}' has no '题目' column")
+        # Without a '正确答案' column every row is unanswered and skipped by `load_into_app`
+        yield chunk.assign(**{column: '' for column in missing})[required_columns]
+
+
+def drop_unanswered(frames: Iterator[pd.DataFrame], skipped: list[int]) -> Iterator[pd.DataFrame]:
+    '''
+    Leave out the rows without a '正确答案': the app has no way to add one later,
+    so such a question could never be answered correctly. Their number is added to `skipped[0]`.
+    '''
+    for frame in frames:
+        answered = frame['正确答案'].fillna('').astype(str).str.strip() != ''
+        skipped[0] += int((~answered).sum())
+        yield frame[answered]
+
+
+def iter_db_frames(db_file: str | Path, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    '''Read the 'questions' table of a chapter database `chunk_size` rows at a time, in insertion order.'''
+    conn = sqlite3.connect(f'file:{Path(db_file).resolve().as_posix()}?mode=ro', uri=True)
+    try:
+        present: set[str] = {row[1] for row in conn.execute("PRAGMA table_info(questions)")}
+        if not present:
+            raise ValueError(f"'{db_file}' has no 'questions' table")
+        # Older chapter databases have no answer column
+        fields: str = ', '.join(
+            f'{column if column in present else "NULL"} AS "{name}"' for column, name in DB_COLUMNS.items()
+        )
+        yield from pd.read_sql_query(f"SELECT {fields} FROM questions ORDER BY id", conn, chunksize=chunk_size)
+    finally:
+        conn.close()
+
+
+def load_into_app(username: str, source_files: list[Path], chunk_size: int = DEFAULT_CHUNK_SIZE,
+                  skip_duplicates: bool = True) -> dict[str, int]:
+    '''
+    Insert every file as a new question set of `username`, with the importer's batched
+    inserts, in a single transaction: either every file is loaded or none is.
+    Files without questions do not leave an empty set behind.
+    Returns:
+        {set name: inserted questions}
+    '''
+    from app import app
+    from models import db, User, QuestionSet
+    from migrations import upgrade_database
+    from importer import REQUIRED_COLUMNS, bulk_insert_questions
+
+    loaded: dict[str, int] = {}
+    with app.app_context():
+        upgrade_database(db.engine)
+        user: Optional[User] = User.query.filter_by(username=username).first()
+        if not user:
+            raise ValueError(f"No user named '{username}'")
+
+        try:
+            for source in source_files:
+                start: float = time.perf_counter()
+                unanswered: list[int] = [0]
+                frames: Iterator[pd.DataFrame] = drop_unanswered(
+                    iter_db_frames(source, chunk_size) if source.suffix == '.db'
+                    else iter_csv_frames(source, REQUIRED_COLUMNS, chunk_size),
+                    unanswered
+                )
+                question_set = QuestionSet(name=source.stem, user_id=user.id)
+                db.session.add(question_set)
+                db.session.flush()
+
+                counts: list[int] = [0, 0]
+                def report(parsed: int, inserted: int, duplicates: int) -> None:
+                    counts[0] += parsed
+                    counts[1] += duplicates
+
+                inserted: int = bulk_insert_questions(frames, user.id, question_set.id, on_chunk=report,
+                                                      skip_duplicates=skip_duplicates)
+                if inserted == 0:
+                    db.session.delete(question_set)
+                    db.session.flush()
+                else:
+                    loaded[source.stem] = inserted
+                if unanswered[0]:
+                    print(f"Warning: '{source}': skipped {unanswered[0]} rows without a '正确答案'")
+                print(f"'{source}': {inserted} of {counts[0] + unanswered[0]} rows inserted, {counts[1]} duplicates skipped "
+                      f"({time.perf_counter() - start:.2f}s)")
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+    return loaded
+
+
 if __name__ == "__main__":
-    CHAPTER_FOLDERS: list[str] = ['chapter2']
-    
-    for chapter in CHAPTER_FOLDERS:
-        DB_OUTPUT_FOLDER: Path = Path.cwd().parent.parent / 'database'
-        all_structured_data_for_chapter: list[QuestionData] = []
-        db_file: Path = DB_OUTPUT_FOLDER / f'{chapter}.db'
\ No newline at end of file
+    if len(sys.argv) < 3:
+        sys.exit('Usage: python convert_csv_to_database.py <username> <chapter.csv | chapter.db> [...]')
+
+    USERNAME: str = sys.argv[1]
+    SOURCE_FILES: list[Path] = [Path(name) for name in sys.argv[2:]]
+    for source in SOURCE_FILES:
+        if source.suffix not in ('.csv', '.db') or not source.is_file():
+            sys.exit(f"Not a .csv or .db file: '{source}'")
+
+    loaded: dict[str, int] = load_into_app(USERNAME, SOURCE_FILES)
+    print(f"Loaded {sum(loaded.values())} questions into {len(loaded)} question sets for '{USERNAME}'.")
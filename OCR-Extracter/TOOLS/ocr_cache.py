@@ -0,0 +1,140 @@
+from importlib import metadata
+from pathlib import Path
+from typing import Any, Optional
+import threading
+import hashlib
+import sqlite3
+import json
+import time
+import os
+
+# Default size budget of the cache file content (rec_texts), override with OCR_CACHE_MAX_MB.
+DEFAULT_MAX_MB: int = 512
+
+
+def _paddleocr_version() -> str:
+    try:
+        return metadata.version('paddleocr')
+    except metadata.PackageNotFoundError:
+        return 'unknown'
+
+
+class OCRCache:
+    '''
+    OCR results stored on local disk (one SQLite file), keyed by the image content hash
+    and the OCR configuration. Unchanged images are never OCRed twice; the least recently
+    used entries are evicted once the cache grows past its size budget.
+    '''
+
+    def __init__(self, cache_file: str | Path, max_bytes: Optional[int] = None) -> None:
+        '''
+        Args:
+            cache_file: SQLite file holding the cache (created if missing).
+            max_bytes: Size budget of the stored texts, defaults to OCR_CACHE_MAX_MB (512 MB).
+        '''
+        self.cache_file: Path = Path(cache_file)
+        self.max_bytes: int = max_bytes or int(os.environ.get('OCR_CACHE_MAX_MB', DEFAULT_MAX_MB)) * 1024 * 1024
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock: threading.Lock = threading.Lock()
+        return None
+
+
+    def _connection(self) -> sqlite3.Connection:
+        # Opened lazily, so an OCRCache can be handed to worker processes before use.
+        if self._conn is None:
+            os.makedirs(self.cache_file.parent, exist_ok=True)
+            self._conn = sqlite3.connect(self.cache_file, timeout=30, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS ocr_results (
+                image_hash TEXT NOT NULL,
+                config_key TEXT NOT NULL,
+                rec_texts TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (image_hash, config_key)
+            )
+            ''')
+            self._conn.execute("CREATE INDEX IF NOT EXISTS ix_ocr_results_last_used ON ocr_results (last_used)")
+            self._conn.commit()
+        return self._conn
+
+
+    def __getstate__(self) -> dict:
+        # Connections cannot cross process boundaries, each process opens its own.
+        return {'cache_file': self.cache_file, 'max_bytes': self.max_bytes}
+
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(state['cache_file'], state['max_bytes'])
+
+
+    @staticmethod
+    def image_hash(image_path: str | Path) -> str:
+        '''SHA-256 of the image file content, read in 1 MB blocks.'''
+        digest = hashlib.sha256()
+        with open(image_path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+
+    @staticmethod
+    def config_key(options: dict[str, Any]) -> str:
+        '''Fingerprint of everything that changes the OCR output: the model options and the PaddleOCR version.'''
+        config: str = json.dumps({'options': options, 'paddleocr': _paddleocr_version()}, sort_keys=True, default=str)
+        return hashlib.sha256(config.encode('utf-8')).hexdigest()[:16]
+
+
+    def get(self, image_hash: str, config_key: str) -> Optional[list[str]]:
+        '''Return the cached `rec_texts` of an image, or None on a miss.'''
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT rec_texts FROM ocr_results WHERE image_hash = ? AND config_key = ?",
+                (image_hash, config_key)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE ocr_results SET last_used = ? WHERE image_hash = ? AND config_key = ?",
+                (time.time(), image_hash, config_key)
+            )
+            conn.commit()
+        return json.loads(row[0])
+
+
+    def put(self, image_hash: str, config_key: str, rec_texts: list[str]) -> None:
+        '''Store the OCR result of an image and evict old entries when over budget.'''
+        payload: str = json.dumps(rec_texts, ensure_ascii=False)
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO ocr_results (image_hash, config_key, rec_texts, size, last_used) VALUES (?, ?, ?, ?, ?)",
+                (image_hash, config_key, payload, len(payload.encode('utf-8')), time.time())
+            )
+            self._evict(conn)
+            conn.commit()
+
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        total: int = conn.execute("SELECT COALESCE(SUM(size), 0) FROM ocr_results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        # Drop least recently used entries until the cache is back under 90% of its budget.
+        target: int = int(self.max_bytes * 0.9)
+        for image_hash, config_key, size in conn.execute(
+            "SELECT image_hash, config_key, size FROM ocr_results ORDER BY last_used"
+        ).fetchall():
+            if total <= target:
+                break
+            conn.execute("DELETE FROM ocr_results WHERE image_hash = ? AND config_key = ?", (image_hash, config_key))
+            total -= size
+
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
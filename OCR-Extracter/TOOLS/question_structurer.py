@@ -0,0 +1,258 @@
+'''
+Turns OCR text lines into question lists, shared by every extractor
+(main.py, OCR-MODEL/Paddle-OCR.py and OCR-Extracter-Algorithm/xiao8.py).
+
+One pass over the lines: continuation lines are buffered until the next item
+("12." or "A.") starts, then the buffered item is parsed as a stem or as options.
+Questions are yielded as soon as the next one starts, so the input may be a generator.
+
+    questions = list(iter_questions(lines, lambda stem: [stem, None, None, None, None]))
+
+Large transcripts can be parsed page by page on a process pool (`iter_questions_parallel`);
+the items cut by a page break are stitched back together, so the result is the same.
+'''
+from concurrent.futures import Executor, ProcessPoolExecutor
+from itertools import islice
+from typing import Any, Callable, Iterable, Iterator, NamedTuple, Optional, Union
+import multiprocessing
+import re
+
+QuestionData = list[Optional[Union[str, bool]]]
+
+# Builds a new question list from its stem, in the extractor's own format.
+# Items 1-4 must be the options A-D.
+QuestionFactory = Callable[[str], QuestionData]
+
+# Stem of the question started when an option shows up twice (strict mode)
+ERROR_STEM: str = 'Errrrrrrrrrrrrrrrrrrrrrrrrrrrrror'
+
+OPTION_INDEX: dict[str, int] = {'A': 1, 'B': 2, 'C': 3, 'D': 4}
+
+# --- Regex Definitions (compiled once) ---
+STEM_RE = re.compile(r'\d+\.\s*')
+OPTION_RE = re.compile(r'[ABCD]\.\s*')
+
+# Lines per page when flat text is cut for the parallel mode (see `chunk_lines`)
+DEFAULT_PAGE_LINES: int = 500
+
+# Kinds of line: a continuation of the previous item, a question stem ("12.") or an option ("A.")
+_CONTINUATION, _STEM, _OPTION = 0, 1, 2
+
+
+# (kind, merged text, where the stem text starts)
+RawItem = tuple[int, str, int]
+# (_STEM, stem text, None) or (_OPTION, ((option index, text), ...), text of the whole item when it has several options)
+ParsedItem = tuple[int, Any, Optional[str]]
+
+
+class OptionConflictError(ValueError):
+    '''An option letter was found twice for the same question.'''
+
+    def __init__(self) -> None:
+        super().__init__("Question recognition error")
+
+
+def _iter_raw_items(text_lines: Iterable[str]) -> Iterator[RawItem]:
+    '''Merge continuation lines into the item they belong to. The first item may be plain text (`_CONTINUATION`).'''
+    item_lines: list[str] = []
+    item_kind: int = _CONTINUATION
+    stem_start: int = 0
+
+    for line in text_lines:
+        line = line.strip()
+        if not line:
+            continue
+
+        # Cheap first-character checks, the regex only runs on lines starting with a digit
+        first: str = line[0]
+        kind: int = _CONTINUATION
+        marker_end: int = 0
+        if first in OPTION_INDEX:
+            if line[1:2] == '.':
+                kind = _OPTION
+        elif first.isdecimal():
+            marker = STEM_RE.match(line)
+            if marker:
+                kind = _STEM
+                marker_end = marker.end()
+
+        if kind == _CONTINUATION and item_lines:
+            item_lines.append(line)
+            continue
+
+        if item_lines:
+            yield item_kind, item_lines[0] if len(item_lines) == 1 else ''.join(item_lines), stem_start
+        item_lines = [line]
+        item_kind = kind
+        stem_start = marker_end
+
+    if item_lines:
+        yield item_kind, item_lines[0] if len(item_lines) == 1 else ''.join(item_lines), stem_start
+
+
+def _parse_item(item: RawItem) -> Optional[ParsedItem]:
+    '''
+    Stem text of a stem item, or the options of an option item: a single one ("A. x")
+    or several inline ones ("A. x B. y"). The text before the first item gives None.
+    '''
+    kind, text, stem_start = item
+    if kind == _STEM:
+        return _STEM, text[stem_start:].strip(), None
+    if kind != _OPTION:
+        return None
+
+    if OPTION_RE.search(text, 2) is None:
+        return _OPTION, ((OPTION_INDEX[text[0]], text[2:].strip()),), None
+
+    starts: list[int] = [match.start() for match in OPTION_RE.finditer(text)]
+    starts.append(len(text))
+    options = tuple((OPTION_INDEX[text[begin]], text[begin + 2:end].strip()) for begin, end in zip(starts, starts[1:]))
+    return _OPTION, options, text[2:].strip()
+
+
+class _QuestionBuilder:
+    '''Applies parsed items, in order, to the question being built.'''
+
+    def __init__(self, new_question: QuestionFactory, strict: bool) -> None:
+        self.new_question: QuestionFactory = new_question
+        self.strict: bool = strict
+        self.current: Optional[QuestionData] = None
+        self.question_count: int = 0
+
+
+    def add(self, item: ParsedItem) -> Optional[QuestionData]:
+        '''Apply one item. Returns the previous question when the item starts a new one.'''
+        kind, payload, whole_text = item
+        previous: Optional[QuestionData] = self.current
+
+        if kind == _STEM:
+            self.current = self.new_question(payload)
+            self.question_count += 1
+            return previous
+
+        # Options before the first question are dropped
+        if previous is None:
+            return None
+
+        if not self.strict:
+            for index, text in payload:
+                previous[index] = text
+            return None
+
+        for index, text in payload:
+            if previous[index] is not None:
+                print(f"{OptionConflictError()}, The error occurred in question {self.question_count + 1}.")
+                self.current = self.new_question(ERROR_STEM)
+                self.question_count += 1
+                # The whole line goes to the error question, under its first option
+                self.current[payload[0][0]] = whole_text if whole_text is not None else payload[0][1]
+                return previous
+            previous[index] = text
+        return None
+
+
+def iter_questions(text_lines: Iterable[str], new_question: QuestionFactory,
+                   strict: bool = False) -> Iterator[QuestionData]:
+    '''
+    Parses raw OCR text lines into questions, lazily.
+    Args:
+        text_lines: OCR text lines, any iterable (read once).
+        new_question: Builds the question list of a stem (see `QuestionFactory`).
+        strict: When an option is found twice for a question, start an `ERROR_STEM` question
+                holding that line instead of overwriting the option.
+    Yields:
+        Every question, once it is complete.
+    '''
+    builder = _QuestionBuilder(new_question, strict)
+    for raw_item in _iter_raw_items(text_lines):
+        item: Optional[ParsedItem] = _parse_item(raw_item)
+        if item is not None:
+            completed: Optional[QuestionData] = builder.add(item)
+            if completed is not None:
+                yield completed
+
+    if builder.current is not None:
+        yield builder.current
+
+
+# --- Parallel mode ---
+
+class PageItems(NamedTuple):
+    '''One page parsed on its own, ready to be stitched to its neighbours.'''
+    head: Optional[str]        # Continuation text at the top of the page (belongs to the previous page's last item)
+    items: list[ParsedItem]    # Items that start and end on this page
+    tail: Optional[RawItem]    # Last item of the page, it may continue on the next page
+
+
+def split_page(text_lines: list[str]) -> PageItems:
+    '''Parse one page (runs in a worker process).'''
+    raw_items: list[RawItem] = list(_iter_raw_items(text_lines))
+    head: Optional[str] = None
+    if raw_items and raw_items[0][0] == _CONTINUATION:
+        head = raw_items.pop(0)[1]
+    if not raw_items:
+        return PageItems(head, [], None)
+
+    tail: RawItem = raw_items.pop()
+    return PageItems(head, [_parse_item(raw_item) for raw_item in raw_items], tail)
+
+
+def chunk_lines(text_lines: Iterable[str], size: int = DEFAULT_PAGE_LINES) -> Iterator[list[str]]:
+    '''Cut flat text into pages of `size` lines, for `iter_questions_parallel`. Any cut is fine.'''
+    lines: Iterator[str] = iter(text_lines)
+    while chunk := list(islice(lines, size)):
+        yield chunk
+
+
+def iter_questions_parallel(pages: Iterable[list[str]], new_question: QuestionFactory, strict: bool = False,
+                            executor: Optional[Executor] = None, workers: Optional[int] = None,
+                            chunksize: int = 4) -> Iterator[QuestionData]:
+    '''
+    Same questions as `iter_questions` over all the pages' lines, but the pages are parsed
+    on a process pool and only the stitching (and `new_question`) runs in this process.
+    Args:
+        pages: Text lines of each page, in order (see `chunk_lines` for flat text).
+        new_question: Builds the question list of a stem. It does not need to be picklable.
+        strict: See `iter_questions`.
+        executor: Pool to use. A process pool of `workers` processes is started (and shut down) when omitted,
+                  with spawn: callers often have Paddle loaded already, which does not survive fork() well.
+        chunksize: Pages sent to a worker at a time.
+    '''
+    own_executor: bool = executor is None
+    if executor is None:
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+
+    try:
+        builder = _QuestionBuilder(new_question, strict)
+        # The item still open at the end of the pages stitched so far
+        carry: Optional[RawItem] = None
+
+        for page in executor.map(split_page, pages, chunksize=chunksize):
+            if page.head is not None:
+                carry = (carry[0], carry[1] + page.head, carry[2]) if carry else (_CONTINUATION, page.head, 0)
+            if page.tail is None:
+                # No item starts on this page, it all continues the open item
+                continue
+
+            parsed_items: list[Optional[ParsedItem]] = page.items
+            if carry is not None:
+                parsed_items = [_parse_item(carry)] + parsed_items
+            for item in parsed_items:
+                if item is not None:
+                    completed: Optional[QuestionData] = builder.add(item)
+                    if completed is not None:
+                        yield completed
+            carry = page.tail
+
+        if carry is not None:
+            item = _parse_item(carry)
+            if item is not None:
+                completed = builder.add(item)
+                if completed is not None:
+                    yield completed
+
+        if builder.current is not None:
+            yield builder.current
+    finally:
+        if own_executor:
+            executor.shutdown()
@@ -0,0 +1,173 @@
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Union
+import sqlite3
+import time
+import sys
+
+# Fingerprints must match the GUI's, so its dedup module is used as is
+sys.path.append(str(Path(__file__).resolve().parents[2] / 'GUI'))
+from dedup import question_fingerprint
+
+QuestionData = list[Optional[Union[str, bool]]]
+
+# Columns of the 8-item QuestionData list, in list order
+QUESTION_COLUMNS: tuple[str, ...] = (
+    'question_stem', 'option_a', 'option_b', 'option_c', 'option_d',
+    'is_multiple_choice', 'correct_answer', 'explanation',
+)
+
+# Bulk writes: WAL + NORMAL sync only fsyncs at checkpoints instead of on every commit
+BULK_PRAGMAS: tuple[str, ...] = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-64000",
+)
+
+DEFAULT_BATCH_SIZE: int = 5000
+# Malformed rows listed in the summary, the rest are only counted
+MAX_REPORTED_ROWS: int = 5
+
+
+class WriteReport:
+    '''Outcome of a bulk write: how many rows went in and which ones were rejected (and why).'''
+
+    def __init__(self) -> None:
+        self.inserted: int = 0
+        self.duplicates: int = 0
+        self.malformed: list[tuple[int, str]] = []
+        self.seconds: float = 0.0
+        return None
+
+
+    def summary(self, target: str | Path) -> str:
+        text: str = f"Saved {self.inserted} questions to '{target}' in {self.seconds:.2f}s"
+        if self.duplicates:
+            text += f", skipped {self.duplicates} duplicates"
+        if not self.malformed:
+            return text
+
+        shown: str = ', '.join(f"#{index} ({reason})" for index, reason in self.malformed[:MAX_REPORTED_ROWS])
+        more: str = f" and {len(self.malformed) - MAX_REPORTED_ROWS} more" if len(self.malformed) > MAX_REPORTED_ROWS else ''
+        return f"{text}, skipped {len(self.malformed)} malformed rows: {shown}{more}"
+
+
+def validate_question(q_list: QuestionData, width: int) -> Optional[str]:
+    '''Returns why a question row cannot be stored, or None when it is fine.'''
+    if len(q_list) != width:
+        return f"expected {width} items, got {len(q_list)}"
+    if not q_list[0] or not str(q_list[0]).strip():
+        return "empty question stem"
+    return None
+
+
+def connect_for_bulk_write(db_file: str | Path) -> sqlite3.Connection:
+    '''Opens `db_file` with the pragmas of `BULK_PRAGMAS`.'''
+    conn = sqlite3.connect(db_file)
+    for pragma in BULK_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+def write_questions(conn: sqlite3.Connection, questions: Iterable[QuestionData],
+                    columns: tuple[str, ...] = QUESTION_COLUMNS, extra_values: tuple = (),
+                    batch_size: int = DEFAULT_BATCH_SIZE, skip_duplicates: bool = False,
+                    check_stored: bool = True) -> WriteReport:
+    '''
+    Validates the questions and inserts them with one `executemany` per batch.
+    Runs inside the caller's transaction, nothing is committed here.
+    Args:
+        conn: Open connection (see `connect_for_bulk_write`).
+        questions: Question lists whose items match `columns` (any iterable, it is read once).
+        columns: Target columns of the `questions` table, in list order.
+        extra_values: Values appended to every row, for extra columns given at the end of `columns`
+                      (e.g. the source image).
+        batch_size: Rows per `executemany` call.
+        skip_duplicates: Store a `fingerprint` column (GUI/dedup.py) and leave out questions whose
+                         fingerprint the table already has or that appear earlier in `questions`.
+        check_stored: With `skip_duplicates`, also look the fingerprints up in the table. False only
+                      drops duplicates within `questions`, for rows whose owner may later replace them.
+    '''
+    report = WriteReport()
+    start: float = time.perf_counter()
+    width: int = len(columns) - len(extra_values)
+    if skip_duplicates:
+        columns = columns + ('fingerprint',)
+    sql: str = f"INSERT INTO questions ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+    # Fingerprints written by this call so far
+    seen: set[str] = set()
+
+    def valid_rows() -> Iterator[tuple]:
+        for index, q_list in enumerate(questions, start=1):
+            reason: Optional[str] = validate_question(q_list, width)
+            if reason is not None:
+                report.malformed.append((index, reason))
+                continue
+            yield tuple(q_list) + extra_values
+
+    rows: Iterator[tuple] = valid_rows()
+    while batch := list(islice(rows, batch_size)):
+        if skip_duplicates:
+            batch = _drop_duplicates(conn, batch, seen, report, check_stored)
+        conn.executemany(sql, batch)
+        report.inserted += len(batch)
+
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+def _drop_duplicates(conn: sqlite3.Connection, batch: list[tuple], seen: set[str], report: WriteReport,
+                     check_stored: bool = True) -> list[tuple]:
+    '''Append the fingerprint to every row and drop the rows already written (one indexed lookup per batch).'''
+    fingerprints: list[str] = [question_fingerprint(*row[:5]) for row in batch]
+    stored: set[str] = set()
+    for start in range(0, len(fingerprints) if check_stored else 0, 900):
+        # Stay under SQLite's bound-parameter limit of older versions
+        part: list[str] = fingerprints[start:start + 900]
+        stored.update(fingerprint for (fingerprint,) in conn.execute(
+            f"SELECT fingerprint FROM questions WHERE fingerprint IN ({', '.join('?' * len(part))})", part
+        ))
+
+    kept: list[tuple] = []
+    for row, fingerprint in zip(batch, fingerprints):
+        if fingerprint in stored or fingerprint in seen:
+            report.duplicates += 1
+            continue
+        seen.add(fingerprint)
+        kept.append(row + (fingerprint,))
+    return kept
+
+
+def save_questions(db_file: str | Path, questions: Iterable[QuestionData],
+                   columns: tuple[str, ...] = QUESTION_COLUMNS) -> WriteReport:
+    '''
+    Saves questions to the `questions` table of `db_file` in a single transaction
+    and prints one summary line (malformed rows included).
+    '''
+    conn = connect_for_bulk_write(db_file)
+    try:
+        with conn:
+            report: WriteReport = write_questions(conn, questions, columns)
+    finally:
+        conn.close()
+
+    print(report.summary(db_file))
+    return report
+
+
+if __name__ == '__main__':
+    # Quick timing: 50k questions into a scratch database
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as folder:
+        db_file: Path = Path(folder) / 'bench.db'
+        conn = sqlite3.connect(db_file)
+        conn.execute(f"CREATE TABLE questions (id INTEGER PRIMARY KEY AUTOINCREMENT, {', '.join(QUESTION_COLUMNS)})")
+        conn.close()
+
+        questions: list[QuestionData] = [
+            [f'Question {i}', 'a', 'b', 'c', 'd', i % 3 == 0, 'A', 'explanation'] for i in range(50_000)
+        ]
+        questions[10] = ['too', 'short']
+        save_questions(db_file, questions)
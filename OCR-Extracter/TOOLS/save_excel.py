@@ -1,29 +1,114 @@
-import numpy as np
-import pandas as pd
-from typing import Optional, Union
+from openpyxl import Workbook
+from typing import Callable, Iterable, Iterator, Optional, TextIO, Union
 from pathlib import Path
+import csv
+import re
 
 QuestionData = list[Optional[Union[str, bool]]]
+
+DEFAULT_COLUMNS: list[str] = ['题目', 'A', 'B', 'C', 'D', '多选', '正确答案']
+DEFAULT_SHEET: str = 'Reshaped Data'
+# CSV rows are collected in a buffer of this size before they hit the disk
+CSV_BUFFER_SIZE: int = 1024 * 1024
+
+# Characters Excel does not allow in sheet names
+_SHEET_NAME_RE = re.compile(r'[\[\]:*?/\\]')
+
+
+def sheet_title(name: str) -> str:
+    '''A valid Excel sheet name: no []:*?/\\ and at most 31 characters.'''
+    return _SHEET_NAME_RE.sub('_', name)[:31] or DEFAULT_SHEET
+
+
 class Excel_Exector:
-    
-    
-    def __init__(self):
-        self.BASE_PATH: Path = Path.cwd()
+
+
+    def __init__(self, base_path: Optional[Path] = None):
+        self.BASE_PATH: Path = base_path or Path.cwd()
         return
-    
-    
-    def store_excel(self, question_lists: list[QuestionData]):
+
+
+    def store_excel(self, question_lists: Iterable[QuestionData]):
         output_file = self.BASE_PATH / 'data.xlsx'
+        self.export(question_lists, xlsx_file=output_file)
+        print(f"\nData successfully written to {output_file}.")
 
-        # Create DataFrame (optional: add column names)
-        df = pd.DataFrame(question_lists, columns=['题目', 'A', 'B', 'C', 'D', '多选', '正确答案'])
 
-        # Write to Excel
-        df.to_excel(output_file, 
-                    sheet_name='Reshaped Data', 
-                    index=False) # Excludes the DataFrame's row index (0, 1, 2, 3)
+    def export(self, questions: Iterable[QuestionData], xlsx_file: Optional[Path] = None, csv_file: Optional[Path] = None,
+               columns: list[str] = DEFAULT_COLUMNS, sheet_key: Optional[Callable[[QuestionData], str]] = None) -> dict[str, int]:
+        '''
+        Stream questions into an .xlsx and/or a .csv file, row by row, with flat memory use
+        (write-only workbook, buffered CSV writer). `questions` may be a generator.
+        Args:
+            xlsx_file / csv_file: Output files, either may be omitted.
+            columns: Header row.
+            sheet_key: Sheet of each question (e.g. its type). One sheet (and one `<csv stem>_<sheet>.csv`) per key.
+        Returns:
+            Number of rows written per sheet.
+        '''
+        return self._write(
+            ((sheet_key(question) if sheet_key else DEFAULT_SHEET, question) for question in questions),
+            xlsx_file, csv_file, columns, split_csv=sheet_key is not None
+        )
+
+
+    def export_sections(self, sections: Iterable[tuple[str, Iterable[QuestionData]]], xlsx_file: Optional[Path] = None,
+                        csv_file: Optional[Path] = None, columns: list[str] = DEFAULT_COLUMNS) -> dict[str, int]:
+        '''
+        Like `export`, with one sheet per named section, e.g. [('chapter1', questions_1), ('chapter2', questions_2)].
+        Every section is read once, in order.
+        '''
+        return self._write(
+            ((name, question) for name, questions in sections for question in questions),
+            xlsx_file, csv_file, columns, split_csv=True
+        )
+
+
+    def _write(self, keyed_rows: Iterator[tuple[str, QuestionData]], xlsx_file: Optional[Path],
+               csv_file: Optional[Path], columns: list[str], split_csv: bool) -> dict[str, int]:
+        # Write-only mode keeps each sheet in a temporary file instead of in memory
+        workbook: Optional[Workbook] = Workbook(write_only=True) if xlsx_file else None
+        sheets: dict = {}
+        csv_files: list[TextIO] = []
+        # Sheet title -> CSV writer (the same writer for every sheet when the CSV is not split)
+        csv_writers: dict = {}
+        counts: dict[str, int] = {}
+
+        def open_csv(path: Path):
+            csv_files.append(open(path, 'w', newline='', encoding='utf-8', buffering=CSV_BUFFER_SIZE))
+            writer = csv.writer(csv_files[-1])
+            writer.writerow(columns)
+            return writer
+
+        try:
+            for key, question in keyed_rows:
+                title: str = sheet_title(key)
+                if title not in counts:
+                    counts[title] = 0
+                    if workbook is not None:
+                        sheets[title] = workbook.create_sheet(title)
+                        sheets[title].append(columns)
+                    if csv_file and split_csv:
+                        csv_writers[title] = open_csv(csv_file.with_name(f'{csv_file.stem}_{title}{csv_file.suffix}'))
+                    elif csv_file:
+                        csv_writers[title] = next(iter(csv_writers.values()), None) or open_csv(csv_file)
+
+                counts[title] += 1
+                if workbook is not None:
+                    sheets[title].append(question)
+                if csv_file:
+                    csv_writers[title].writerow(question)
+
+            if workbook is not None:
+                if not sheets:
+                    workbook.create_sheet(DEFAULT_SHEET).append(columns)
+                workbook.save(xlsx_file)
+        finally:
+            for f in csv_files:
+                f.close()
+
+        return counts
 
-        print(f"\nData successfully written to {output_file} in four columns.")
 
 if __name__ == '__main__':
     TEST_CONTENTS: list[QuestionData] = [
@@ -31,6 +116,6 @@ if __name__ == '__main__':
         ['题目2', 'A 1', 'B 2', 'C 3', 'D 4', 'True', 'A'],
         ['题目3', 'A 1', 'B 2', 'C 3', 'D 4', 'True', 'A']
     ]
-    
+
     E = Excel_Exector()
-    E.store_excel(TEST_CONTENTS)
\ No newline at end of file
+    E.store_excel(TEST_CONTENTS)
@@ -1,10 +1,22 @@
 import paddle
-import re
 import json
 import sqlite3
 import os  # Added for file/directory operations
+import sys
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
 from paddleocr import PaddleOCR
-from typing import Optional, Union
+from typing import Any, Iterable, Iterator, Optional, Union
+
+# Shared helpers live in OCR-Extracter/TOOLS
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'OCR-Extracter', 'TOOLS'))
+# Question fingerprints are shared with the GUI (GUI/dedup.py)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'GUI'))
+from ocr_cache import OCRCache
+from question_writer import QUESTION_COLUMNS, WriteReport, connect_for_bulk_write, write_questions
+from dedup import question_fingerprint
+from question_structurer import iter_questions
 
 # --- NEW TYPE ALIAS ---
 # This list will hold:
@@ -19,43 +31,75 @@ from typing import Optional, Union
 QuestionData = list[Optional[Union[str, bool]]]
 
 
-def ocr_extract(input_img: str, output_file: str) -> None:
+# Options that shape the OCR output (they are also part of the OCR cache key)
+OCR_OPTIONS: dict[str, Any] = {
+    'lang': 'ch',
+    'use_doc_orientation_classify': False,
+    'use_doc_unwarping': False,
+    'use_textline_orientation': False,
+    'enable_mkldnn': False,
+}
+
+
+def create_ocr_model(**options) -> PaddleOCR:
+    '''Builds the PaddleOCR model used by this script. Extra `options` (device, threads) are passed to PaddleOCR.'''
+    return PaddleOCR(**OCR_OPTIONS, **options)
+
+
+def ocr_extract(input_img: str, output_file: Optional[str] = None, ocr: Optional[PaddleOCR] = None,
+                cache: Optional[OCRCache] = None, image_hash: Optional[str] = None) -> list[str]:
     '''
     Using paddle to fetch image information.
     Args:
         input_img: Storage path of the photos to be extracted.
-        output_file: The extracted content will be stored in `JSON` format.
+        output_file: When given, the extracted content is also stored there in `JSON` format.
+        ocr: An already loaded model. A new one is built when omitted (slow, seconds per call).
+        cache: Optional OCR result cache. On a hit the cached text is returned and no OCR runs.
+        image_hash: `OCRCache.image_hash` of the image, when the caller already computed it.
+    Returns:
+        The recognised text lines (`rec_texts`).
     '''
-    if paddle.device.is_compiled_with_cuda():
-        print(f"Using GPU for acceleration... (Image: {input_img})")
-    else:
-        print(f"Using CPU... (Image: {input_img})")
-
-    # Initialize OCR
-    ocr = PaddleOCR(
-        lang='ch',
-        use_doc_orientation_classify=False,
-        use_doc_unwarping=False,
-        use_textline_orientation=False,
-        enable_mkldnn=False 
-    )
+    if cache is not None:
+        image_hash = image_hash or cache.image_hash(input_img)
+        config_key: str = cache.config_key(OCR_OPTIONS)
+        cached_texts: Optional[list[str]] = cache.get(image_hash, config_key)
+        if cached_texts is not None:
+            print(f"Unchanged image, using cached OCR result... (Image: {input_img})")
+            return cached_texts
+
+    if ocr is None:
+        if paddle.device.is_compiled_with_cuda():
+            print(f"Using GPU for acceleration... (Image: {input_img})")
+        else:
+            print(f"Using CPU... (Image: {input_img})")
+
+        # Initialize OCR
+        ocr = create_ocr_model()
 
     # Run OCR identification
     result = ocr.predict(input=input_img)
 
-    # --- REVERTED TO USER'S PREFERENCE ---
-    # Save the result using the .save_to_json() method
+    # The text goes straight back to the caller, the JSON file is only an optional debug artifact
+    rec_texts: list[str] = []
     if result:
-        # Ensure output directory exists before saving
-        os.makedirs(os.path.dirname(output_file), exist_ok=True)
+        if output_file is not None:
+            # Ensure output directory exists before saving
+            os.makedirs(os.path.dirname(output_file), exist_ok=True)
         for res in result:
             # This will save the result of the first page (or only page)
             # and overwrite if multiple pages are in the result.
             # Assuming one page per image.
-            res.save_to_json(output_file)
+            if output_file is not None:
+                res.save_to_json(output_file)
+            rec_texts = list(res['rec_texts'])
+
+        if cache is not None:
+            cache.put(image_hash, config_key, rec_texts)
     else:
         print(f"No OCR result for image: {input_img}")
 
+    return rec_texts
+
 
 def fetch_image_text(json_file: str) -> list[str]:
     '''Reads the OCR JSON output and returns a list of text lines.'''
@@ -83,94 +127,102 @@ def fetch_image_text(json_file: str) -> list[str]:
         return []
 
 
-def structure_questions(text_lines: list[str]) -> list[QuestionData]:
+# --- Batch OCR on a process pool ---
+# Each worker process loads the model once (in `_init_ocr_worker`) and keeps it for every image it gets.
+_worker_ocr: Optional[PaddleOCR] = None
+_worker_cache: Optional[OCRCache] = None
+
+
+def _init_ocr_worker(cpu_threads: int, cache: Optional[OCRCache]) -> None:
+    global _worker_ocr, _worker_cache
+    _worker_ocr = create_ocr_model(device='cpu', cpu_threads=cpu_threads)
+    _worker_cache = cache
+
+
+# (image path, json output file or None, image hash)
+OCRTask = tuple[str, Optional[str], str]
+# (text lines, OCR seconds, error message or None)
+OCRTaskResult = tuple[list[str], float, Optional[str]]
+
+
+def _ocr_task(task: OCRTask) -> OCRTaskResult:
+    '''
+    Runs in a worker: OCR one image with the worker's model (or the cache).
+    Errors are returned instead of raised, so one bad image does not stop the batch.
+    '''
+    image_path, json_output_file, image_hash = task
+    start: float = time.perf_counter()
+    try:
+        rec_texts: list[str] = ocr_extract(image_path, json_output_file, ocr=_worker_ocr, cache=_worker_cache, image_hash=image_hash)
+    except Exception as error:
+        return [], time.perf_counter() - start, f"{type(error).__name__}: {error}"
+    return rec_texts, time.perf_counter() - start, None
+
+
+def create_ocr_pool(workers: int, cache: Optional[OCRCache] = None) -> ProcessPoolExecutor:
+    '''
+    CPU-only process pool for `batch_ocr`. The machine's cores are split between the
+    workers, so they do not oversubscribe the CPU with Paddle's own threads.
+    '''
+    cpu_threads: int = max(1, (os.cpu_count() or 1) // workers)
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        # Paddle does not survive fork() well, start clean interpreters instead.
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_ocr_worker,
+        initargs=(cpu_threads, cache)
+    )
+
+
+def batch_ocr(pool: ProcessPoolExecutor, tasks: list[OCRTask]) -> Iterator[OCRTaskResult]:
+    '''
+    OCR (image path, json output file or None, image hash) tasks on the pool.
+    Yields each image's (text lines, seconds, error) in the order of `tasks`, as soon as they are ready.
+    '''
+    yield from pool.map(_ocr_task, tasks, chunksize=1)
+
+
+def new_question(stem_text: str) -> QuestionData:
+    '''The 8-item list of a new question (answer and explanation are placeholders).'''
+    # Check for multiple choice keywords
+    is_multi = "multiple selection" in stem_text.lower() or "多选" in stem_text
+
+    return [
+        stem_text,  # 0: stem
+        None,       # 1: A
+        None,       # 2: B
+        None,       # 3: C
+        None,       # 4: D
+        is_multi,   # 5: is_multiple_choice
+        'A',        # 6: correct_answer (placeholder)
+        'This is a placeholder explanation.' # 7: explanation (placeholder)
+    ]
+
+
+def structure_questions(text_lines: Iterable[str]) -> list[QuestionData]:
     """
-    Parses raw OCR text lines into a structured list of questions.
-    1. Merges continuation text.
-    2. Structures into an 8-item list per your new format.
+    Parses raw OCR text lines (any iterable, e.g. a generator) into a structured list of questions,
+    with the shared single-pass structurer (see TOOLS/question_structurer.py).
+    A repeated option overwrites the previous one.
     
     Returns:
-        list[QuestionData]
+        list[QuestionData], 8-item lists per your new format.
     """
-    
-    # --- 1. Regex Definitions ---
-    new_item_re = re.compile(r'^(?:\d+\.|[ABCD]\.)\s*')
-    question_stem_re = re.compile(r'^\d+\.\s*')
-    multi_option_find_re = re.compile(r'[ABCD]\.\s*')
-    multi_option_split_re = re.compile(r'(?=[ABCD]\.\s*)')
-    option_clean_re = re.compile(r'^[ABCD]\.\s*')
-    
-    # --- 2. Pass 1: Merge Continuation Text ---
-    merged_lines: list[str] = []
-    for line in text_lines:
-        line = line.strip()
-        if not line:
-            continue
-        
-        if new_item_re.search(line) or not merged_lines:
-            merged_lines.append(line)
-        else:
-            merged_lines[-1] += "" + line
+    return list(iter_questions(text_lines, new_question))
 
-    # --- 3. Pass 2: Structure into Question lists ---
-    all_questions: list[QuestionData] = []
-    
-    option_map: dict[str, int] = {'A': 1, 'B': 2, 'C': 3, 'D': 4}
 
-    def store_option(question_list: QuestionData, option_text: str) -> None:
-        """Helper function to clean and store an option in the correct index."""
-        option_text = option_text.strip()
-        if not option_text:
-            return
-        
-        if option_text[0] in option_map:
-            option_char: str = option_text[0]
-            index: int = option_map[option_char]
-            clean_text: str = option_clean_re.sub('', option_text).strip()
-            
-            if 0 <= index < len(question_list):
-                question_list[index] = clean_text
-
-    # --- Main Loop for Pass 2 ---
-    for line in merged_lines:
-        if question_stem_re.search(line):
-            # --- MODIFIED: Create 8-item list ---
-            stem_text = question_stem_re.sub('', line).strip()
-            # Check for multiple choice keywords
-            is_multi = "multiple selection" in stem_text.lower() or "多选" in stem_text
-
-            current_question_list: QuestionData = [
-                stem_text,  # 0: stem
-                None,       # 1: A
-                None,       # 2: B
-                None,       # 3: C
-                None,       # 4: D
-                is_multi,   # 5: is_multiple_choice
-                'A',        # 6: correct_answer (placeholder)
-                'This is a placeholder explanation.' # 7: explanation (placeholder)
-            ]
-            all_questions.append(current_question_list)
-        
-        elif all_questions: # Only process options if a question has been started
-            # This line is potentially an option
-            active_question_list: QuestionData = all_questions[-1] # Get the 8-item list
-            
-            option_matches = multi_option_find_re.findall(line)
-            
-            if len(option_matches) >= 2:
-                split_parts: list[str] = multi_option_split_re.split(line)
-                for part in split_parts:
-                    store_option(active_question_list, part)
-            elif len(option_matches) == 1 and line.startswith(tuple(option_map.keys())):
-                store_option(active_question_list, line)
-            
-    return all_questions
+# Statuses of the run manifest. Images in a finished status with an unchanged hash are skipped.
+STATUS_DONE: str = 'done'
+STATUS_EMPTY: str = 'empty'
+STATUS_FAILED: str = 'failed'
+FINISHED_STATUSES: tuple[str, ...] = (STATUS_DONE, STATUS_EMPTY)
 
 
 def create_database(db_file: str) -> None:
     """
-    Creates an empty SQLite database with the 'questions' table.
-    The schema matches the 8-item QuestionData list.
+    Creates the chapter SQLite database if it does not exist yet: the 'questions' table
+    (the 8-item QuestionData list plus the image it came from) and the 'ocr_manifest' run manifest.
+    Existing data is kept, so an interrupted batch can resume.
     """
     try:
         os.makedirs(os.path.dirname(db_file), exist_ok=True)
@@ -178,11 +230,9 @@ def create_database(db_file: str) -> None:
         conn = sqlite3.connect(db_file)
         cursor = conn.cursor()
         
-        cursor.execute("DROP TABLE IF EXISTS questions")
-        
         # This schema maps directly to the 8-item list
         cursor.execute('''
-        CREATE TABLE questions (
+        CREATE TABLE IF NOT EXISTS questions (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             question_stem TEXT NOT NULL,
             option_a TEXT,
@@ -191,46 +241,205 @@ def create_database(db_file: str) -> None:
             option_d TEXT,
             is_multiple_choice BOOLEAN NOT NULL DEFAULT 0,
             correct_answer TEXT,
-            explanation TEXT
+            explanation TEXT,
+            source_image TEXT,
+            fingerprint TEXT
+        )
+        ''')
+
+        columns: list[str] = [row[1] for row in cursor.execute("PRAGMA table_info(questions)")]
+        if 'source_image' not in columns:
+            # Database from before the manifest: its rows cannot be matched to images,
+            # so they are rebuilt from the images like every run used to do.
+            cursor.execute("ALTER TABLE questions ADD COLUMN source_image TEXT")
+            cursor.execute("DELETE FROM questions")
+
+        if 'fingerprint' not in columns:
+            # Questions saved before duplicate detection: fingerprint them once
+            cursor.execute("ALTER TABLE questions ADD COLUMN fingerprint TEXT")
+            rows = cursor.execute("SELECT id, question_stem, option_a, option_b, option_c, option_d FROM questions").fetchall()
+            cursor.executemany(
+                "UPDATE questions SET fingerprint = ? WHERE id = ?",
+                ((question_fingerprint(*row[1:]), row[0]) for row in rows)
+            )
+
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_questions_source_image ON questions (source_image)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_questions_fingerprint ON questions (fingerprint)")
+
+        # One row per image: what was processed, with which content and how it went
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS ocr_manifest (
+            image_name TEXT PRIMARY KEY,
+            image_hash TEXT NOT NULL,
+            status TEXT NOT NULL,
+            question_count INTEGER NOT NULL DEFAULT 0,
+            ocr_seconds REAL,
+            error TEXT,
+            updated_at TEXT NOT NULL
         )
         ''')
         
         conn.commit()
         conn.close()
-        print(f"Successfully created/reset database: '{db_file}'")
+        print(f"Database ready: '{db_file}'")
     except sqlite3.Error as e:
         print(f"Database error: {e}")
 
 
-def save_questions_to_db(db_file: str, questions: list[QuestionData]) -> None:
+def load_manifest(db_file: str) -> dict[str, str]:
+    """Returns {image name: image hash} of the images already processed into `db_file`."""
+    conn = sqlite3.connect(db_file)
+    try:
+        placeholders: str = ', '.join('?' * len(FINISHED_STATUSES))
+        rows = conn.execute(
+            f"SELECT image_name, image_hash FROM ocr_manifest WHERE status IN ({placeholders})",
+            FINISHED_STATUSES
+        ).fetchall()
+    finally:
+        conn.close()
+    return dict(rows)
+
+
+def remove_missing_images(db_file: str, image_names: list[str]) -> list[str]:
     """
-    Saves the list of structured (8-item) questions to the SQLite database.
+    Deletes the questions and manifest rows of images that are no longer in the chapter folder
+    (deleted or renamed since the last run), so they do not linger or get inserted twice.
+    Returns:
+        The names of the removed images.
     """
+    conn = sqlite3.connect(db_file)
     try:
-        conn = sqlite3.connect(db_file)
-        cursor = conn.cursor()
-        
-        for q_list in questions:
-            # --- MODIFIED: q_list is now the 8-item list ---
-            if len(q_list) != 8:
-                print(f"Warning: Skipping malformed question data: {q_list}")
-                continue
-            
-            data_to_insert = tuple(q_list)
-            
-            # The 8 '?' placeholders match the 8 items in QuestionData
-            cursor.execute('''
-            INSERT INTO questions (
-                question_stem, option_a, option_b, option_c, option_d,
-                is_multiple_choice, correct_answer, explanation
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', data_to_insert)
-        
-        conn.commit()
+        with conn:
+            stored: set[str] = {row[0] for row in conn.execute("SELECT image_name FROM ocr_manifest")}
+            stored.update(row[0] for row in conn.execute("SELECT DISTINCT source_image FROM questions WHERE source_image IS NOT NULL"))
+            missing: list[str] = sorted(stored - set(image_names))
+            # Batches below SQLite's limit of 999 bound parameters
+            for start in range(0, len(missing), 900):
+                part: list[str] = missing[start:start + 900]
+                placeholders: str = ', '.join('?' * len(part))
+                conn.execute(f"DELETE FROM questions WHERE source_image IN ({placeholders})", part)
+                conn.execute(f"DELETE FROM ocr_manifest WHERE image_name IN ({placeholders})", part)
+    finally:
         conn.close()
-        print(f"Successfully saved {len(questions)} questions to '{db_file}'")
+    return missing
+
+
+def save_image_result(db_file: str, image_name: str, image_hash: str, status: str,
+                      questions: list[QuestionData], ocr_seconds: float, error: Optional[str] = None) -> None:
+    """
+    Upserts the result of one image in a single transaction: its previous questions are
+    replaced by `questions` and its manifest row is updated. A failed image keeps its old questions.
+    Duplicates are only dropped within the image: a question another image also holds is kept,
+    since that image may be re-OCRed without it. Overlaps between images are skipped when
+    the chapter is loaded into the app (see TOOLS/convert_csv_to_database.py).
+    """
+    conn = connect_for_bulk_write(db_file)
+    try:
+        with conn:
+            question_count: int = 0
+            if status != STATUS_FAILED:
+                conn.execute("DELETE FROM questions WHERE source_image = ?", (image_name,))
+
+                # The 8 items of QuestionData, tagged with the image they came from
+                report: WriteReport = write_questions(
+                    conn, questions, QUESTION_COLUMNS + ('source_image',), extra_values=(image_name,),
+                    skip_duplicates=True, check_stored=False
+                )
+                question_count = report.inserted
+                if report.malformed or report.duplicates:
+                    print(f"  -> {report.summary(db_file)}")
+
+            conn.execute('''
+            INSERT INTO ocr_manifest (image_name, image_hash, status, question_count, ocr_seconds, error, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (image_name) DO UPDATE SET
+                image_hash = excluded.image_hash,
+                status = excluded.status,
+                question_count = excluded.question_count,
+                ocr_seconds = excluded.ocr_seconds,
+                error = excluded.error,
+                updated_at = excluded.updated_at
+            ''', (image_name, image_hash, status, question_count, ocr_seconds, error, time.strftime('%Y-%m-%d %H:%M:%S')))
     except sqlite3.Error as e:
-        print(f"Database error while inserting: {e}")
+        print(f"Database error while saving {image_name}: {e}")
+    finally:
+        conn.close()
+
+
+def count_questions(db_file: str) -> int:
+    conn = sqlite3.connect(db_file)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM questions").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def process_chapter(ocr_pool: ProcessPoolExecutor, image_folder: str, db_file: str,
+                    json_output_folder: Optional[str] = None) -> None:
+    """
+    Brings the chapter database `db_file` up to date with the images in `image_folder`:
+    new or changed images are OCRed on `ocr_pool` and saved, images that are gone are removed.
+    Args:
+        json_output_folder: When given, the OCR JSON of every image is kept there (debugging only).
+    """
+    chapter: str = os.path.basename(image_folder)
+    if not os.path.isdir(image_folder):
+        print(f"Warning: Folder not found, skipping: {image_folder}")
+        return
+
+    image_files: list[str] = sorted(
+        f for f in os.listdir(image_folder)
+        if f.lower().endswith(('.png', '.jpg', '.jpeg'))
+    )
+
+    print(f"Found {len(image_files)} images in {image_folder}")
+
+    # 1. Open (or create) the chapter database and its run manifest,
+    # and drop what images that were deleted or renamed left behind
+    create_database(db_file)
+    removed_images: list[str] = remove_missing_images(db_file, image_files)
+    if removed_images:
+        print(f"Removed {len(removed_images)} images no longer in {image_folder}: {', '.join(removed_images)}")
+    manifest: dict[str, str] = load_manifest(db_file)
+
+    # 2. Only new or changed images (or the ones that failed last time) are processed
+    image_hashes: dict[str, str] = {
+        image_name: OCRCache.image_hash(os.path.join(image_folder, image_name)) for image_name in image_files
+    }
+    pending_images: list[str] = [
+        image_name for image_name in image_files if manifest.get(image_name) != image_hashes[image_name]
+    ]
+    print(f"{len(image_files) - len(pending_images)} images unchanged since the last run, {len(pending_images)} to process")
+
+    ocr_tasks: list[OCRTask] = [
+        (
+            os.path.join(image_folder, image_name),
+            os.path.join(json_output_folder, f"{chapter}_{os.path.splitext(image_name)[0]}.json") if json_output_folder else None,
+            image_hashes[image_name]
+        )
+        for image_name in pending_images
+    ]
+
+    # 3. OCR on the worker pool (or reuse cached results), in image order, and
+    # 4. upsert every image's questions as soon as it is done, so a crash loses at most the images in flight
+    for image_name, (rec_texts_list, ocr_seconds, error) in zip(pending_images, batch_ocr(ocr_pool, ocr_tasks)):
+        image_hash: str = image_hashes[image_name]
+
+        if error is not None:
+            print(f"  -> OCR failed for {image_name}: {error}")
+            save_image_result(db_file, image_name, image_hash, STATUS_FAILED, [], ocr_seconds, error)
+            continue
+
+        if not rec_texts_list:
+            print(f"  -> No text found in {image_name}. Skipping.")
+            save_image_result(db_file, image_name, image_hash, STATUS_EMPTY, [], ocr_seconds)
+            continue
+
+        structured_data: list[QuestionData] = structure_questions(rec_texts_list)
+        print(f"  -> Extracted {len(structured_data)} questions from {image_name} ({ocr_seconds:.1f}s)")
+        save_image_result(db_file, image_name, image_hash, STATUS_DONE, structured_data, ocr_seconds)
+
+    print(f"{db_file} now holds {count_questions(db_file)} questions.")
 
 
 if __name__ == '__main__':
@@ -240,62 +449,28 @@ if __name__ == '__main__':
     IMAGE_BASE_FOLDER: str = 'input_images'
     JSON_OUTPUT_FOLDER: str = 'output'
     DB_OUTPUT_FOLDER: str = 'database'
+    # OCR results of unchanged images are reused from here
+    OCR_CACHE_FILE: str = os.path.join('cache', 'ocr_cache.sqlite')
+    # Number of OCR worker processes (each one loads its own model once)
+    OCR_WORKERS: int = int(os.environ.get('OCR_WORKERS', os.cpu_count() or 1))
+    # Keep the per-image OCR JSON files (for debugging only, the pipeline itself runs in memory)
+    SAVE_OCR_JSON: bool = os.environ.get('SAVE_OCR_JSON') == '1'
     
-    os.makedirs(JSON_OUTPUT_FOLDER, exist_ok=True)
+    if SAVE_OCR_JSON:
+        os.makedirs(JSON_OUTPUT_FOLDER, exist_ok=True)
     os.makedirs(DB_OUTPUT_FOLDER, exist_ok=True)
 
+    ocr_pool: ProcessPoolExecutor = create_ocr_pool(OCR_WORKERS, OCRCache(OCR_CACHE_FILE))
+
     # --- Main Processing Loop ---
     for chapter in CHAPTER_FOLDERS:
         print(f"\n--- Processing Chapter: {chapter} ---")
-        
-        image_folder: str = os.path.join(IMAGE_BASE_FOLDER, chapter)
-        db_file: str = os.path.join(DB_OUTPUT_FOLDER, f"{chapter}.db")
-        
-        if not os.path.isdir(image_folder):
-            print(f"Warning: Folder not found, skipping: {image_folder}")
-            continue
-            
-        all_structured_data_for_chapter: list[QuestionData] = []
-        
-        image_files: list[str] = [
-            f for f in os.listdir(image_folder) 
-            if f.lower().endswith(('.png', '.jpg', '.jpeg'))
-        ]
-        
-        print(f"Found {len(image_files)} images in {image_folder}")
-        
-        for image_name in image_files:
-            image_path: str = os.path.join(image_folder, image_name)
-            json_file_name: str = f"{chapter}_{os.path.splitext(image_name)[0]}.json"
-            json_output_file: str = os.path.join(JSON_OUTPUT_FOLDER, json_file_name)
-            
-            # 1. Run OCR
-            ocr_extract(image_path, json_output_file)
-            
-            # 2. Load the JSON data
-            rec_texts_list = fetch_image_text(json_output_file)
-            
-            if not rec_texts_list:
-                print(f"  -> No text found in {json_output_file}. Skipping.")
-                continue
-            
-            # 3. Structure questions
-            structured_data = structure_questions(rec_texts_list)
-            
-            print(f"  -> Extracted {len(structured_data)} questions from {image_name}")
-            all_structured_data_for_chapter.extend(structured_data)
+        process_chapter(
+            ocr_pool, os.path.join(IMAGE_BASE_FOLDER, chapter), os.path.join(DB_OUTPUT_FOLDER, f"{chapter}.db"),
+            JSON_OUTPUT_FOLDER if SAVE_OCR_JSON else None
+        )
 
-        if not all_structured_data_for_chapter:
-            print(f"No questions extracted for chapter {chapter}. Skipping database creation.")
-            continue
-            
-        # 4. Create the database (this will reset it)
-        print(f"\nCreating database for {chapter}...")
-        create_database(db_file)
-        
-        # 5. Save all extracted questions to the DB
-        print(f"Saving {len(all_structured_data_for_chapter)} total questions to {db_file}...")
-        save_questions_to_db(db_file, all_structured_data_for_chapter)
+    ocr_pool.shutdown()
 
     print(f"\n--- Batch Process Complete ---")
-    print(f"Databases are located in the '{DB_OUTPUT_FOLDER}' folder.")
\ No newline at end of file
+    print(f"Databases are located in the '{DB_OUTPUT_FOLDER}' folder.")
@@ -0,0 +1,75 @@
+'''
+Incremental runs of main.py: the chapter database follows the image folder,
+including images that were deleted or renamed between runs.
+'''
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import sqlite3
+import sys
+
+import pytest
+
+pytest.importorskip('paddleocr')
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import main  # noqa: E402
+
+
+def fake_ocr_task(task: main.OCRTask) -> main.OCRTaskResult:
+    '''The "image" files hold their text lines, so no model is needed.'''
+    image_path, _, _ = task
+    return Path(image_path).read_text(encoding='utf-8').splitlines(), 0.0, None
+
+
+def stored_questions(db_file: Path) -> list[tuple[str, str]]:
+    conn = sqlite3.connect(db_file)
+    try:
+        return conn.execute("SELECT source_image, question_stem FROM questions ORDER BY source_image, id").fetchall()
+    finally:
+        conn.close()
+
+
+def manifest_names(db_file: Path) -> list[str]:
+    conn = sqlite3.connect(db_file)
+    try:
+        return [row[0] for row in conn.execute("SELECT image_name FROM ocr_manifest ORDER BY image_name")]
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def chapter(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    monkeypatch.setattr(main, '_ocr_task', fake_ocr_task)
+    folder: Path = tmp_path / 'chapter1'
+    folder.mkdir()
+    (folder / 'page1.png').write_text('1. 第一题\nA. a\nB. b\n2. 第二题\nA. c\nB. d\n', encoding='utf-8')
+    (folder / 'page2.png').write_text('3. 第三题\nA. e\nB. f\n', encoding='utf-8')
+    return folder
+
+
+def run(folder: Path, db_file: Path) -> None:
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        main.process_chapter(pool, str(folder), str(db_file))
+
+
+def test_removed_image_is_dropped(chapter: Path, tmp_path: Path) -> None:
+    db_file: Path = tmp_path / 'database' / 'chapter1.db'
+    run(chapter, db_file)
+    assert manifest_names(db_file) == ['page1.png', 'page2.png']
+    assert len(stored_questions(db_file)) == 3
+
+    (chapter / 'page2.png').unlink()
+    run(chapter, db_file)
+    assert manifest_names(db_file) == ['page1.png']
+    assert [image for image, _ in stored_questions(db_file)] == ['page1.png', 'page1.png']
+
+
+def test_renamed_image_is_not_stored_twice(chapter: Path, tmp_path: Path) -> None:
+    db_file: Path = tmp_path / 'database' / 'chapter1.db'
+    run(chapter, db_file)
+
+    (chapter / 'page2.png').rename(chapter / 'page3.png')
+    run(chapter, db_file)
+    assert manifest_names(db_file) == ['page1.png', 'page3.png']
+    assert stored_questions(db_file) == [
+        ('page1.png', '第一题'), ('page1.png', '第二题'), ('page3.png', '第三题')
+    ]